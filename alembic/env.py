@@ -10,7 +10,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from app.db.session import engine
 from app.db.base import Base
-from app.db.models import user, transaction  # <-- это важно!
+from app.db.models import user, transaction, alert, counterparty, change, sketch, idempotency, budget  # <-- это важно!
 target_metadata = Base.metadata  # импортируем все модели, чтобы Alembic их видел
 
 
@@ -0,0 +1,26 @@
+"""add user data version
+
+Revision ID: 3c1f9a7d2b10
+Revises: 89205e831994
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1f9a7d2b10'
+down_revision = '89205e831994'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('data_version', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('data_updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'data_updated_at')
+    op.drop_column('users', 'data_version')
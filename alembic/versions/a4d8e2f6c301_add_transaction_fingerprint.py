@@ -0,0 +1,93 @@
+"""add transaction fingerprint and recurring payments
+
+Revision ID: a4d8e2f6c301
+Revises: 7b2e4c9d1a55
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+import hashlib
+import re
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d8e2f6c301'
+down_revision = '7b2e4c9d1a55'
+branch_labels = None
+depends_on = None
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+def _fingerprint(tx_type, amount, date_time, inn, s_acc, r_acc):
+    # копия app/utils/fingerprint.transaction_fingerprint на момент миграции
+    raw = "|".join((
+        tx_type,
+        f"{round(float(amount), 2):.2f}",
+        date_time.date().isoformat(),
+        (inn or "").strip(),
+        _NON_DIGITS.sub("", s_acc or ""),
+        _NON_DIGITS.sub("", r_acc or ""),
+    ))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def upgrade() -> None:
+    op.add_column('transactions', sa.Column('fingerprint', sa.String(length=40), nullable=True))
+    op.add_column('transactions', sa.Column('duplicate_of_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('fk_transactions_duplicate_of', 'transactions', 'transactions',
+                          ['duplicate_of_id'], ['id'], ondelete='SET NULL')
+
+    # заполняем отпечатки существующих строк и помечаем уже имеющиеся дубликаты
+    conn = op.get_bind()
+    rows = conn.execute(sa.text(
+        "SELECT id, user_id, transaction_type, amount, date_time, recipient_inn, "
+        "sender_account, recipient_account FROM transactions "
+        "WHERE date_time IS NOT NULL ORDER BY id"
+    ))
+    seen = {}
+    batch = []
+    update = sa.text("UPDATE transactions SET fingerprint = :fp, duplicate_of_id = :dup WHERE id = :id")
+    for r in rows:
+        fp = _fingerprint(r.transaction_type, r.amount, r.date_time,
+                          r.recipient_inn, r.sender_account, r.recipient_account)
+        dup = seen.setdefault((r.user_id, fp), r.id)
+        batch.append({"id": r.id, "fp": fp, "dup": dup if dup != r.id else None})
+        if len(batch) >= 5000:
+            conn.execute(update, batch)
+            batch = []
+    if batch:
+        conn.execute(update, batch)
+
+    op.create_index('ix_transactions_user_fingerprint', 'transactions', ['user_id', 'fingerprint'], unique=False)
+
+    op.create_table('recurring_payments',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('recipient_inn', sa.String(), nullable=False),
+    sa.Column('transaction_type', postgresql.ENUM('income', 'expense', name='transactiontype', create_type=False), nullable=False),
+    sa.Column('occurrences', sa.Integer(), nullable=False),
+    sa.Column('avg_amount', sa.Float(), nullable=False),
+    sa.Column('interval_days', sa.Float(), nullable=False),
+    sa.Column('first_date', sa.DateTime(), nullable=False),
+    sa.Column('last_date', sa.DateTime(), nullable=False),
+    sa.Column('next_expected', sa.DateTime(), nullable=False),
+    sa.Column('detected_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_recurring_payments_id'), 'recurring_payments', ['id'], unique=False)
+    op.create_index(op.f('ix_recurring_payments_user_id'), 'recurring_payments', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_recurring_payments_user_id'), table_name='recurring_payments')
+    op.drop_index(op.f('ix_recurring_payments_id'), table_name='recurring_payments')
+    op.drop_table('recurring_payments')
+    op.drop_index('ix_transactions_user_fingerprint', table_name='transactions')
+    op.drop_constraint('fk_transactions_duplicate_of', 'transactions', type_='foreignkey')
+    op.drop_column('transactions', 'duplicate_of_id')
+    op.drop_column('transactions', 'fingerprint')
@@ -0,0 +1,53 @@
+"""create budgets tables
+
+Revision ID: a7c3e5f1b924
+Revises: f3a6d9b2c718
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e5f1b924'
+down_revision = 'f3a6d9b2c718'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('budgets',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('category', sa.String(), nullable=False),
+    sa.Column('category_key', sa.String(), nullable=False),
+    sa.Column('period', sa.String(length=8), nullable=False),
+    sa.Column('limit_amount', sa.Float(), nullable=False),
+    sa.Column('thresholds', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'category_key', 'period', name='uq_budgets_user_category_period')
+    )
+    op.create_index(op.f('ix_budgets_id'), 'budgets', ['id'], unique=False)
+
+    op.create_table('budget_usage',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('budget_id', sa.Integer(), nullable=False),
+    sa.Column('period_start', sa.DateTime(), nullable=False),
+    sa.Column('spent', sa.Float(), nullable=False),
+    sa.Column('tx_count', sa.Integer(), nullable=False),
+    sa.Column('notified_level', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['budget_id'], ['budgets.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('budget_id', 'period_start', name='uq_budget_usage_budget_period')
+    )
+    op.create_index(op.f('ix_budget_usage_id'), 'budget_usage', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_budget_usage_id'), table_name='budget_usage')
+    op.drop_table('budget_usage')
+    op.drop_index(op.f('ix_budgets_id'), table_name='budgets')
+    op.drop_table('budgets')
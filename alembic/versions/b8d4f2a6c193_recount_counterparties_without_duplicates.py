@@ -0,0 +1,49 @@
+"""recount counterparty totals without flagged duplicates
+
+Revision ID: b8d4f2a6c193
+Revises: a7c3e5f1b924
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d4f2a6c193'
+down_revision = 'a7c3e5f1b924'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Первое наполнение counterparties (c9e1b3a7f402) учитывало и помеченные дубликаты,
+    # а сервисный слой их из итогов исключает – пересчитываем итоги по оригиналам
+    op.execute("""
+        UPDATE counterparties c SET
+            tx_count = coalesce(a.tx_count, 0),
+            total_amount = coalesce(a.total_amount, 0),
+            income_amount = coalesce(a.income_amount, 0),
+            expense_amount = coalesce(a.expense_amount, 0),
+            first_seen = a.first_seen,
+            last_seen = a.last_seen
+        FROM counterparties c2
+        LEFT JOIN (
+            SELECT counterparty_id,
+                   count(*) AS tx_count,
+                   sum(amount) AS total_amount,
+                   sum(amount) FILTER (WHERE transaction_type = 'income') AS income_amount,
+                   sum(amount) FILTER (WHERE transaction_type = 'expense') AS expense_amount,
+                   min(date_time) AS first_seen,
+                   max(date_time) AS last_seen
+            FROM transactions
+            WHERE duplicate_of_id IS NULL AND counterparty_id IS NOT NULL
+            GROUP BY counterparty_id
+        ) a ON a.counterparty_id = c2.id
+        WHERE c2.id = c.id
+    """)
+
+
+def downgrade() -> None:
+    # данные не откатываются: итоги с дубликатами были ошибкой
+    pass
@@ -0,0 +1,78 @@
+"""create counterparties table
+
+Revision ID: c9e1b3a7f402
+Revises: a4d8e2f6c301
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9e1b3a7f402'
+down_revision = 'a4d8e2f6c301'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('counterparties',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('inn', sa.String(), nullable=False),
+    sa.Column('bank', sa.String(), nullable=True),
+    sa.Column('account', sa.String(), nullable=True),
+    sa.Column('tx_count', sa.Integer(), nullable=False),
+    sa.Column('total_amount', sa.Float(), nullable=False),
+    sa.Column('income_amount', sa.Float(), nullable=False),
+    sa.Column('expense_amount', sa.Float(), nullable=False),
+    sa.Column('first_seen', sa.DateTime(), nullable=True),
+    sa.Column('last_seen', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'inn', name='uq_counterparties_user_inn')
+    )
+    op.create_index(op.f('ix_counterparties_id'), 'counterparties', ['id'], unique=False)
+    op.create_index('ix_counterparties_user_total', 'counterparties', ['user_id', 'total_amount'], unique=False)
+    op.create_index('ix_counterparties_user_count', 'counterparties', ['user_id', 'tx_count'], unique=False)
+
+    op.add_column('transactions', sa.Column('counterparty_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('fk_transactions_counterparty', 'transactions', 'counterparties',
+                          ['counterparty_id'], ['id'])
+
+    # Наполняем справочник из существующих транзакций (банк/счёт – из самой поздней).
+    # Помеченные дубликаты (a4d8e2f6c301) в итоги не входят, как и в сервисном слое,
+    # но контрагент для них заводится – на него ссылается counterparty_id
+    op.execute("""
+        INSERT INTO counterparties (user_id, inn, bank, account, tx_count, total_amount,
+                                    income_amount, expense_amount, first_seen, last_seen)
+        SELECT user_id, recipient_inn,
+               (array_agg(recipient_bank ORDER BY date_time DESC NULLS LAST))[1],
+               (array_agg(recipient_account ORDER BY date_time DESC NULLS LAST))[1],
+               count(*) FILTER (WHERE duplicate_of_id IS NULL),
+               coalesce(sum(amount) FILTER (WHERE duplicate_of_id IS NULL), 0),
+               coalesce(sum(amount) FILTER (WHERE duplicate_of_id IS NULL AND transaction_type = 'income'), 0),
+               coalesce(sum(amount) FILTER (WHERE duplicate_of_id IS NULL AND transaction_type = 'expense'), 0),
+               min(date_time) FILTER (WHERE duplicate_of_id IS NULL),
+               max(date_time) FILTER (WHERE duplicate_of_id IS NULL)
+        FROM transactions
+        WHERE user_id IS NOT NULL
+        GROUP BY user_id, recipient_inn
+    """)
+    op.execute("""
+        UPDATE transactions t SET counterparty_id = c.id
+        FROM counterparties c
+        WHERE c.user_id = t.user_id AND c.inn = t.recipient_inn
+    """)
+    op.create_index(op.f('ix_transactions_counterparty_id'), 'transactions', ['counterparty_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_transactions_counterparty_id'), table_name='transactions')
+    op.drop_constraint('fk_transactions_counterparty', 'transactions', type_='foreignkey')
+    op.drop_column('transactions', 'counterparty_id')
+    op.drop_index('ix_counterparties_user_count', table_name='counterparties')
+    op.drop_index('ix_counterparties_user_total', table_name='counterparties')
+    op.drop_index(op.f('ix_counterparties_id'), table_name='counterparties')
+    op.drop_table('counterparties')
@@ -0,0 +1,42 @@
+"""create transaction changes table
+
+Revision ID: d2f7a9c4e815
+Revises: c9e1b3a7f402
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f7a9c4e815'
+down_revision = 'c9e1b3a7f402'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('transaction_changes',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('transaction_id', sa.Integer(), nullable=False),
+    sa.Column('op', sa.String(length=6), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_transaction_changes_user_id_id', 'transaction_changes', ['user_id', 'id'], unique=False)
+
+    # Стартовая точка: каждая существующая транзакция – upsert, чтобы since=0 отдавал полное состояние
+    op.execute("""
+        INSERT INTO transaction_changes (user_id, transaction_id, op, changed_at)
+        SELECT user_id, id, 'upsert', now() FROM transactions
+        WHERE user_id IS NOT NULL
+        ORDER BY id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_transaction_changes_user_id_id', table_name='transaction_changes')
+    op.drop_table('transaction_changes')
@@ -0,0 +1,42 @@
+"""create monthly sketches table
+
+Revision ID: e5b8c1d4f926
+Revises: d2f7a9c4e815
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b8c1d4f926'
+down_revision = 'd2f7a9c4e815'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Заполнять не нужно: отсутствующие месяцы собираются при первом чтении
+    op.create_table('monthly_sketches',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.DateTime(), nullable=False),
+    sa.Column('transaction_type', postgresql.ENUM('income', 'expense', name='transactiontype', create_type=False), nullable=False),
+    sa.Column('tx_count', sa.Integer(), nullable=False),
+    sa.Column('digest', sa.Text(), nullable=True),
+    sa.Column('hll', sa.LargeBinary(), nullable=True),
+    sa.Column('histogram', sa.Text(), nullable=True),
+    sa.Column('stale', sa.Boolean(), nullable=False),
+    sa.Column('built_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'month', 'transaction_type', name='uq_monthly_sketches_user_month_type')
+    )
+    op.create_index(op.f('ix_monthly_sketches_id'), 'monthly_sketches', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_monthly_sketches_id'), table_name='monthly_sketches')
+    op.drop_table('monthly_sketches')
@@ -0,0 +1,63 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from app.dependencies.oauth2 import oauth2_scheme
+from app.db.session import SessionLocal
+from app.db.models.alert import Alert
+from app.schemas.alert import AlertOut
+from app.services.auth import get_user_by_email
+from app.utils.security import verify_token
+
+router = APIRouter()
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_current_user(token: str, db: Session):
+    payload = verify_token(token)
+    user = get_user_by_email(db, payload.get("sub"))
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return user
+
+
+@router.get("/", response_model=List[AlertOut], summary="Алерты мониторинга")
+def read_alerts(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+    unacknowledged: bool = Query(False, description="Только непросмотренные"),
+    rule: str = Query(None, description="Правило (amount, velocity, new_counterparty, status_burst, budget)"),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """Последние алерты текущего пользователя, новые сверху."""
+    user = get_current_user(token, db)
+    q = db.query(Alert).filter(Alert.user_id == user.id)
+    if unacknowledged:
+        q = q.filter(Alert.acknowledged.is_(False))
+    if rule:
+        q = q.filter(Alert.rule == rule)
+    return q.order_by(Alert.created_at.desc(), Alert.id.desc()).limit(limit).all()
+
+
+@router.post("/{alert_id}/ack", response_model=AlertOut, summary="Отметить алерт просмотренным")
+def acknowledge_alert(
+    alert_id: int,
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+):
+    user = get_current_user(token, db)
+    alert = db.query(Alert).filter(Alert.id == alert_id, Alert.user_id == user.id).first()
+    if not alert:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Alert not found")
+    alert.acknowledged = True
+    db.commit()
+    db.refresh(alert)
+    return alert
@@ -0,0 +1,75 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.dependencies.oauth2 import oauth2_scheme
+from app.db.session import SessionLocal
+from app.db.models.budget import Budget
+from app.schemas.budget import BudgetCreate, BudgetOut, BudgetUpdate
+from app.services import budgets
+from app.services.auth import get_user_by_email
+from app.utils.security import verify_token
+
+router = APIRouter()
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_current_user(token: str, db: Session):
+    payload = verify_token(token)
+    user = get_user_by_email(db, payload.get("sub"))
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return user
+
+
+def get_budget(db: Session, budget_id: int, user_id: int) -> Budget:
+    budget = db.query(Budget).filter(Budget.id == budget_id, Budget.user_id == user_id).first()
+    if not budget:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Budget not found")
+    return budget
+
+
+@router.get("/", response_model=List[BudgetOut], summary="Бюджеты и расход за текущий период")
+def read_budgets(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    """Расход читается из накопленных итогов budget_usage, без агрегации по transactions."""
+    user = get_current_user(token, db)
+    rows = db.query(Budget).filter(Budget.user_id == user.id).order_by(Budget.category_key, Budget.period).all()
+    return budgets.statuses(db, rows)
+
+
+@router.post("/", response_model=BudgetOut, status_code=status.HTTP_201_CREATED, summary="Создать бюджет")
+def create_budget(budget_data: BudgetCreate, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    """Лимит по категории; расход текущего периода считается сразу по уже сохранённым транзакциям."""
+    user = get_current_user(token, db)
+    budget = budgets.create(db, user.id, budget_data.category, budget_data.period,
+                            budget_data.limit_amount, budget_data.thresholds)
+    return budgets.statuses(db, [budget])[0]
+
+
+@router.get("/{budget_id}", response_model=BudgetOut, summary="Бюджет")
+def read_budget(budget_id: int, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    user = get_current_user(token, db)
+    return budgets.statuses(db, [get_budget(db, budget_id, user.id)])[0]
+
+
+@router.put("/{budget_id}", response_model=BudgetOut, summary="Изменить лимит или пороги")
+def update_budget(budget_id: int, budget_data: BudgetUpdate, token: str = Depends(oauth2_scheme),
+                  db: Session = Depends(get_db)):
+    user = get_current_user(token, db)
+    budget = budgets.update(db, get_budget(db, budget_id, user.id), budget_data.limit_amount, budget_data.thresholds)
+    return budgets.statuses(db, [budget])[0]
+
+
+@router.delete("/{budget_id}", status_code=status.HTTP_204_NO_CONTENT, summary="Удалить бюджет")
+def delete_budget(budget_id: int, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    user = get_current_user(token, db)
+    db.delete(get_budget(db, budget_id, user.id))
+    db.commit()
@@ -0,0 +1,93 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from app.dependencies.oauth2 import oauth2_scheme
+from app.db.session import SessionLocal
+from app.db.routing import get_read_db
+from app.db.models.counterparty import Counterparty
+from app.schemas.counterparty import CounterpartyOut
+from app.services.auth import get_user_by_email
+from app.utils.security import verify_token
+
+router = APIRouter()
+
+# Сортировки справочника – все по индексам (user_id, ...)
+SORT_COLUMNS = {
+    "total": Counterparty.total_amount,
+    "count": Counterparty.tx_count,
+    "income": Counterparty.income_amount,
+    "expense": Counterparty.expense_amount,
+    "last_seen": Counterparty.last_seen,
+}
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_current_user(token: str, db: Session):
+    payload = verify_token(token)
+    user = get_user_by_email(db, payload.get("sub"))
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return user
+
+
+@router.get("/", response_model=List[CounterpartyOut], summary="Список контрагентов")
+def read_counterparties(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_read_db),
+    sort: str = Query("total", regex="^(total|count|income|expense|last_seen)$"),
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+):
+    """Контрагенты с накопленными итогами (без агрегации по transactions)."""
+    user = get_current_user(token, db)
+    return (
+        db.query(Counterparty)
+        .filter(Counterparty.user_id == user.id, Counterparty.tx_count > 0)
+        .order_by(SORT_COLUMNS[sort].desc(), Counterparty.id)
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+
+
+@router.get("/top", response_model=List[CounterpartyOut], summary="Топ-N контрагентов")
+def top_counterparties(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_read_db),
+    n: int = Query(10, ge=1, le=100),
+    by: str = Query("total", regex="^(total|count|income|expense)$"),
+):
+    user = get_current_user(token, db)
+    return (
+        db.query(Counterparty)
+        .filter(Counterparty.user_id == user.id, Counterparty.tx_count > 0)
+        .order_by(SORT_COLUMNS[by].desc())
+        .limit(n)
+        .all()
+    )
+
+
+@router.get("/{inn}", response_model=CounterpartyOut, summary="Контрагент по ИНН")
+def read_counterparty(
+    inn: str,
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_read_db),
+):
+    user = get_current_user(token, db)
+    cp = (
+        db.query(Counterparty)
+        .filter(Counterparty.user_id == user.id, Counterparty.inn == inn, Counterparty.tx_count > 0)
+        .first()
+    )
+    if not cp:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Counterparty not found")
+    return cp
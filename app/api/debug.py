@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from app.core.config import settings
+from app.db import profiler
+from app.dependencies.oauth2 import oauth2_scheme
+from app.utils import admission
+from app.utils.security import verify_token
+
+router = APIRouter()
+
+
+def debug_enabled(token: str = Depends(oauth2_scheme)):
+    """Журналы содержат SQL и параметры всех пользователей – только для DEBUG_ADMIN_EMAILS"""
+    if not settings.DEBUG_ENDPOINTS:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    payload = verify_token(token)
+    admins = {e.strip().lower() for e in settings.DEBUG_ADMIN_EMAILS.split(",") if e.strip()}
+    if str(payload.get("sub", "")).lower() not in admins:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+
+@router.get("/slow-queries", dependencies=[Depends(debug_enabled)], summary="Медленные SQL-запросы с планами")
+def read_slow_queries(limit: int = Query(50, ge=1, le=1000)):
+    """Последние запросы дольше SLOW_QUERY_MS с EXPLAIN (ANALYZE, BUFFERS), новые сверху."""
+    return list(reversed(profiler.slow_queries))[:limit]
+
+
+@router.get("/query-budget", dependencies=[Depends(debug_enabled)], summary="Запросы сверх бюджета")
+def read_budget_violations(limit: int = Query(50, ge=1, le=1000)):
+    """HTTP-запросы, превысившие QUERY_BUDGET_COUNT или QUERY_BUDGET_MS."""
+    return list(reversed(profiler.budget_violations))[:limit]
+
+
+@router.get("/admission", dependencies=[Depends(debug_enabled)], summary="Загрузка шлюзов допуска")
+def read_admission():
+    """Занятая ёмкость, очередь и среднее время запроса по шлюзам этого процесса."""
+    return {gate.name: gate.snapshot() for gate in (admission.reports_gate, admission.stats_gate)}
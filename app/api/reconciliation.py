@@ -0,0 +1,91 @@
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+from sqlalchemy.orm import Session
+
+from app.dependencies.oauth2 import oauth2_scheme
+from app.db.session import SessionLocal
+from app.db.models.transaction import TransactionStatus
+from app.schemas.reconciliation import ReconciliationResult, StatusUpdateRequest, StatusUpdateResult
+from app.services import reconciliation
+from app.services.auth import get_user_by_email
+from app.services.transaction import update_status_bulk
+from app.utils.security import verify_token
+
+router = APIRouter()
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_current_user(token: str, db: Session):
+    payload = verify_token(token)
+    user = get_user_by_email(db, payload.get("sub"))
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return user
+
+
+def _line_out(line: reconciliation.StatementLine) -> dict:
+    return {
+        "line": line.line,
+        "date_time": line.date_time,
+        "amount": line.kopecks / 100,
+        "recipient_inn": line.recipient_inn,
+        "reference": line.reference,
+    }
+
+
+def _tx_out(tx: reconciliation.StoredTx) -> dict:
+    return {
+        "id": tx.id,
+        "date_time": tx.date_time,
+        "amount": tx.kopecks / 100,
+        "recipient_inn": tx.recipient_inn,
+        "status": tx.status,
+    }
+
+
+@router.post("/", response_model=ReconciliationResult, summary="Сверка с банковской выпиской")
+def reconcile_statement(
+    file: UploadFile = File(..., description="CSV: date_time, amount, recipient_inn [, transaction_type, sender_account, recipient_account, reference]"),
+    date_tolerance_days: int = Query(2, ge=0, le=31, description="Допуск по дате, дней"),
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+):
+    """
+    Сопоставляет строки выписки с транзакциями по сумме, ИНН, счетам и дате (± допуск).
+    Возвращает совпавшие пары, строки без транзакций (missing) и транзакции без строк (extra).
+    """
+    user = get_current_user(token, db)
+    lines = reconciliation.parse_statement(file.file.read())
+    result = reconciliation.reconcile(db, user.id, lines, date_tolerance_days)
+    return {
+        "period_from": result["period_from"],
+        "period_to": result["period_to"],
+        "matched_count": len(result["matched"]),
+        "missing_count": len(result["missing"]),
+        "extra_count": len(result["extra"]),
+        "matched": [{"statement": _line_out(line), "transaction": _tx_out(tx)} for line, tx in result["matched"]],
+        "missing": [_line_out(line) for line in result["missing"]],
+        "extra": [_tx_out(tx) for tx in result["extra"]],
+    }
+
+
+@router.post("/status", response_model=StatusUpdateResult, summary="Смена статуса сверенных транзакций")
+def update_reconciled_status(
+    body: StatusUpdateRequest,
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+):
+    """
+    Переводит транзакции (обычно matched из сверки) в новый статус одним commit,
+    по умолчанию «Подтвержденная» -> «Платеж выполнен». Транзакции в другом статусе пропускаются.
+    """
+    user = get_current_user(token, db)
+    from_status = TransactionStatus(body.from_status.value) if body.from_status else None
+    updated = update_status_bulk(db, user.id, body.transaction_ids, TransactionStatus(body.to_status.value), from_status)
+    return {"updated": updated}
@@ -1,31 +1,25 @@
 # app/api/reports.py
 from datetime import datetime, date
-from io import BytesIO
-from pathlib import Path
 from typing import Optional
 
-import pandas as pd
 from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.pdfgen import canvas
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 from sqlalchemy.orm import Session
 
 from app.db.models.transaction import Transaction as Tx
 from app.schemas.transaction import TransactionStatus, TransactionType
 from app.dependencies.oauth2 import oauth2_scheme
 from app.db.session import SessionLocal
+from app.db.routing import get_read_db
 from app.utils.security import verify_token
 from app.services.auth import get_user_by_email
+from app.services import export
+from app.services.reports import build_dataframe, render_pdf, render_xlsx, XLSX_MEDIA_TYPE
+from app.utils.admission import GatedStreamingResponse, reports_gate
 
 router = APIRouter()
 
-# Путь к TTF‑шрифту (поддерживает кириллицу)
-FONT_PATH = Path(__file__).parent.parent / "static" / "fonts" / "DejaVuSans.ttf"
-FONT_NAME = "DejaVuSans"
-
 # ────────────────────────── DB session ──────────────────────────
 def get_db():
     db = SessionLocal()
@@ -35,7 +29,7 @@ def get_db():
         db.close()
 
 # ─────────── фильтр (тот же, что в  /transactions) ────────────
-def filtered_q(
+def build_query(
     user_id: int,
     db: Session,
     start: Optional[date], end: Optional[date],
@@ -45,9 +39,11 @@ def filtered_q(
     category: Optional[str],
     s_bank: Optional[str],
     r_bank: Optional[str],
-    inn: Optional[str]
+    inn: Optional[str],
+    entities=(Tx,),
 ):
-    q = db.query(Tx).filter(Tx.user_id == user_id)
+    # помеченные дубликаты (повторный импорт выписки) в отчёт не попадают
+    q = db.query(*entities).filter(Tx.user_id == user_id, Tx.duplicate_of_id.is_(None))
 
     if start:
         q = q.filter(Tx.date_time >= datetime.combine(start, datetime.min.time()))
@@ -70,13 +66,17 @@ def filtered_q(
     if inn:
         q = q.filter(Tx.recipient_inn == inn)
 
-    return q.all()
+    return q
+
+
+def filtered_q(*args, **kwargs):
+    return build_query(*args, **kwargs).all()
 
 # ───────────────────── /reports ─────────────────────
-@router.get("/reports", summary="Скачать отчёт (PDF или Excel)")
-def download_report(
+@router.get("/reports", summary="Скачать отчёт (PDF, Excel, CSV, Arrow или Parquet)")
+async def download_report(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 
     start: Optional[date] = Query(None),
     end:   Optional[date] = Query(None),
@@ -89,94 +89,78 @@ def download_report(
     recipient_bank: Optional[str] = Query(None),
     recipient_inn: Optional[str]  = Query(None),
 
-    format: str = Query("pdf", regex="^(pdf|xlsx)$")   # <- regex вместо pattern
+    format: str = Query("pdf", regex="^(pdf|xlsx|csv|arrow|parquet)$")   # <- regex вместо pattern
 ):
-    # ---------- auth ----------
-    payload = verify_token(token)
-    user = get_user_by_email(db, payload["sub"])
-    if not user:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-
-    data = filtered_q(
-        user.id, db,
-        start, end, status_, transaction_type,
-        min_amount, max_amount,
-        category, sender_bank, recipient_bank, recipient_inn
-    )
+    streamed = format in export.MEDIA_TYPES
+
+    # ---------- auth, выборка и её стоимость: в пуле потоков ----------
+    def prepare():
+        payload = verify_token(token)
+        user = get_user_by_email(db, payload["sub"])
+        if not user:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+        q = build_query(
+            user.id, db,
+            start, end, status_, transaction_type,
+            min_amount, max_amount,
+            category, sender_bank, recipient_bank, recipient_inn,
+            entities=export.export_entities() if streamed else (Tx,),
+        )
+        if streamed:
+            if not db.query(q.exists()).scalar():
+                raise HTTPException(status_code=404, detail="Нет данных за выбранный период")
+            if format != "csv" and not export.pyarrow_available():
+                raise HTTPException(status_code=501, detail="Для форматов arrow/parquet нужен пакет pyarrow")
+        weight = reports_gate.weight_of(q)
+        user_id = user.id
+        # соединение возвращается в пул до ожидания в шлюзе; запрос q потом возьмёт новое
+        db.close()
+        return user_id, q, weight
+
+    user_id, q, weight = await run_in_threadpool(prepare)
+
+    # ---------- допуск: ожидание в цикле событий, без потока и соединения с БД ----------
+    slot = await reports_gate.acquire(user_id, weight)
+
+    # ---------- CSV / Arrow / Parquet: потоком, пачками с серверного курсора ----------
+    if streamed:
+        body = export.csv_stream(q) if format == "csv" else export.arrow_stream(q, format)
+        # место в шлюзе держится, пока идёт поток, и освобождается при любом исходе отправки
+        fname = f"report_{datetime.utcnow():%Y%m%d_%H%M%S}.{format}"
+        return GatedStreamingResponse(
+            slot,
+            reports_gate.stream(slot, body),
+            media_type=export.MEDIA_TYPES[format],
+            headers={"Content-Disposition": f'attachment; filename=\"{fname}\"'},
+        )
+
+    def render():
+        data = q.all()
+        if not data:
+            raise HTTPException(status_code=404, detail="Нет данных за выбранный период")
+
+        # ---------- DataFrame ----------
+        df = build_dataframe(data)
 
-    if not data:
-        raise HTTPException(status_code=404, detail="Нет данных за выбранный период")
-
-    # ---------- DataFrame ----------
-    df = pd.DataFrame([{
-        "ID": t.id,
-        "Дата / время": t.date_time.strftime("%d.%m.%Y %H:%M"),
-        "Тип": t.transaction_type.value,
-        "Категория": t.category or "",
-        "Сумма": f"{t.amount:.2f}",
-        "Статус": t.status.value,
-        "Банк получателя": t.recipient_bank or "",
-        "ИНН получателя": t.recipient_inn
-    } for t in data])
+        # ---------- Excel / PDF ----------
+        try:
+            return render_xlsx(df) if format == "xlsx" else render_pdf(df)
+        except FileNotFoundError as exc:
+            raise HTTPException(status_code=500, detail=str(exc))
+
+    with slot:
+        buf = await run_in_threadpool(render)
 
     # ---------- Excel ----------
     if format == "xlsx":
-        buf = BytesIO()
-        with pd.ExcelWriter(buf, engine="xlsxwriter") as writer:
-            df.to_excel(writer, index=False, sheet_name="Report")
-        buf.seek(0)
         fname = f"report_{datetime.utcnow():%Y%m%d_%H%M%S}.xlsx"
         return StreamingResponse(
             buf,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            media_type=XLSX_MEDIA_TYPE,
             headers={"Content-Disposition": f'attachment; filename=\"{fname}\"'}
         )
 
     # ---------- PDF ----------
-    # регистрируем шрифт (один раз за процесс)
-    if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
-        if not FONT_PATH.exists():
-            raise HTTPException(status_code=500, detail="Шрифт DejaVuSans.ttf не найден")
-        pdfmetrics.registerFont(TTFont(FONT_NAME, str(FONT_PATH)))
-
-    buf = BytesIO()
-    pdf = canvas.Canvas(buf, pagesize=landscape(A4))
-    pdf.setFont(FONT_NAME, 9)
-
-    # вычисляем ширину колонок
-    cols = list(df.columns)
-    col_w = []
-    for col in cols:
-        max_len = max(len(str(x)) for x in df[col].tolist() + [col])
-        # 6 px ≈ средняя ширина символа шрифтом 9 pt
-        col_w.append(max(60, min(140, max_len * 6)))
-
-    x0, y0 = 40, A4[0] - 40
-    row_h  = 14
-
-    # --- заголовок таблицы ---
-    x = x0
-    for w, name in zip(col_w, cols):
-        pdf.drawString(x, y0, name)
-        x += w
-    pdf.line(x0, y0 - 2, x0 + sum(col_w), y0 - 2)
-
-    # --- строки ---
-    y = y0
-    for _, row in df.iterrows():
-        y -= row_h
-        if y < 40:                       # новая страница
-            pdf.showPage()
-            pdf.setFont(FONT_NAME, 9)
-            y = y0
-        x = x0
-        for w, val in zip(col_w, row):
-            pdf.drawString(x, y, str(val))
-            x += w
-
-    pdf.save()
-    buf.seek(0)
-
     fname = f"report_{datetime.utcnow():%Y%m%d_%H%M%S}.pdf"
     return StreamingResponse(
         buf,
@@ -1,27 +1,38 @@
+import asyncio
+import json
 from datetime import datetime, date
 from typing import List, Optional, Dict, Any
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy import func, case
 from sqlalchemy.orm import Session
 
 from app.dependencies.oauth2 import oauth2_scheme
 from app.db.session import SessionLocal
-from app.db.models.transaction import Transaction as TransactionModel
+from app.db.routing import get_read_db
+from app.db.models.transaction import Transaction as TransactionModel, RecurringPayment
 from app.schemas.transaction import (
     TransactionCreate,
     TransactionUpdate,
     TransactionOut,
     TransactionType,
     TransactionStatus,
+    TransactionBulkResult,
+    RecurringPaymentOut,
 )
 from app.services.transaction import (
     get_transaction as get_transaction_by_id,
     create_transaction,
+    create_transactions_bulk,
     update_transaction,
     delete_transaction,
 )
+from app.services import changes, comparison, events, idempotency, sketches, snapshots
 from app.services.auth import get_user_by_email
+from app.utils.admission import stats_admission
+from app.utils.http_cache import conditional_response
 from app.utils.security import verify_token
 
 router = APIRouter()
@@ -41,8 +52,10 @@ def get_db():
     summary="Список транзакций с фильтрацией",
 )
 def read_transactions(
+    request: Request,
+    response: Response,
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     start_date:      Optional[date]             = Query(None, description="Дата от (YYYY-MM-DD)"),
     end_date:        Optional[date]             = Query(None, description="Дата до (YYYY-MM-DD)"),
     status_:         Optional[TransactionStatus] = Query(None, alias="status",           description="Статус транзакции"),
@@ -57,12 +70,18 @@ def read_transactions(
     """
     Получить транзакции текущего пользователя с опциональной фильтрацией по:
     дате, сумме, статусу, типу, категории, банкам и ИНН.
+    Поддерживает If-None-Match / If-Modified-Since (ответ 304).
     """
     payload = verify_token(token)
     user = get_user_by_email(db, payload.get("sub"))
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
+    # Данные не менялись с прошлого запроса – 304 без тела
+    not_modified = conditional_response(request, response, user)
+    if not_modified:
+        return not_modified
+
     q = db.query(TransactionModel).filter(TransactionModel.user_id == user.id)
 
     if start_date:
@@ -93,10 +112,13 @@ def read_transactions(
     "/stats",
     summary="Статистика и данные для дашбордов",
     response_model=Dict[str, Any],
+    dependencies=[Depends(stats_admission)],
 )
 def get_statistics(
+    request: Request,
+    response: Response,
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     start_date:     Optional[date]             = Query(None, description="Дата от"),
     end_date:       Optional[date]             = Query(None, description="Дата до"),
     status_:        Optional[TransactionStatus] = Query(None, alias="status", description="Статус"),
@@ -117,14 +139,31 @@ def get_statistics(
      5) Кол-во по банкам отправителя
      6) Кол-во по банкам получателя
     С учётом тех же фильтров, что и основной список.
+    Поддерживает If-None-Match / If-Modified-Since (ответ 304).
     """
     payload = verify_token(token)
     user = get_user_by_email(db, payload.get("sub"))
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-    # Собираем все фильтры
-    base_filters = [TransactionModel.user_id == user.id]
+    # Данные не менялись с прошлого запроса – 304 без тела
+    not_modified = conditional_response(request, response, user)
+    if not_modified:
+        return not_modified
+
+    # Актуальный снимок в mmap-файле – считаем по нему, без запросов к БД
+    snap = snapshots.current(db, user)
+    if snap is not None:
+        return snapshots.stats(
+            snap,
+            datetime.combine(start_date, datetime.min.time()) if start_date else None,
+            datetime.combine(end_date, datetime.max.time()) if end_date else None,
+            status_, transaction_type, min_amount, max_amount,
+            category, sender_bank, recipient_bank, recipient_inn,
+        )
+
+    # Собираем все фильтры; помеченные дубликаты в статистику не входят
+    base_filters = [TransactionModel.user_id == user.id, TransactionModel.duplicate_of_id.is_(None)]
     if start_date:
         base_filters.append(TransactionModel.date_time >= datetime.combine(start_date, datetime.min.time()))
     if end_date:
@@ -230,3 +269,288 @@ def get_statistics(
         "by_sender_bank":    [{"bank": b,    "count": c} for b, c    in by_sender],
         "by_recipient_bank": [{"bank": b,    "count": c} for b, c    in by_recipient],
     }
+
+
+@router.get(
+    "/stats/distribution",
+    summary="Процентили и распределение сумм",
+    response_model=Dict[str, Any],
+    dependencies=[Depends(stats_admission)],
+)
+def get_distribution(
+    request: Request,
+    response: Response,
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_read_db),
+    start_date:       Optional[date]            = Query(None, description="Дата от (с точностью до месяца)"),
+    end_date:         Optional[date]            = Query(None, description="Дата до (с точностью до месяца)"),
+    transaction_type: Optional[TransactionType] = Query(None, alias="type", description="Тип"),
+):
+    """
+    Приближённые процентили сумм (p50/p90/p99), гистограмма и число различных
+    контрагентов за период и по месяцам. Считается слиянием помесячных скетчей
+    (t-digest, HyperLogLog), поэтому период берётся целыми месяцами.
+    Поддерживает If-None-Match / If-Modified-Since (ответ 304).
+    """
+    payload = verify_token(token)
+    user = get_user_by_email(db, payload.get("sub"))
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+    not_modified = conditional_response(request, response, user)
+    if not_modified:
+        return not_modified
+
+    return sketches.distribution(
+        db,
+        user.id,
+        datetime.combine(start_date, datetime.min.time()) if start_date else None,
+        datetime.combine(end_date, datetime.min.time()) if end_date else None,
+        transaction_type,
+    )
+
+
+@router.get(
+    "/stats/compare",
+    summary="Сравнение периодов",
+    response_model=Dict[str, Any],
+    dependencies=[Depends(stats_admission)],
+)
+def get_comparison(
+    request: Request,
+    response: Response,
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_read_db),
+    start_date: Optional[date] = Query(None, description="Начало базового периода (по умолчанию – 1-е число текущего месяца)"),
+    end_date:   Optional[date] = Query(None, description="Конец базового периода (по умолчанию – последний день текущего месяца)"),
+    compare:    List[str]      = Query(["previous"], description="previous | year_ago | YYYY-MM-DD..YYYY-MM-DD"),
+):
+    """
+    Кол-во и суммы по типам, статусам, банкам и категориям для базового
+    и сравниваемых периодов с дельтами – всё одним запросом.
+    Поддерживает If-None-Match / If-Modified-Since (ответ 304).
+    """
+    payload = verify_token(token)
+    user = get_user_by_email(db, payload.get("sub"))
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+    # период по умолчанию зависит от текущей даты – он входит в ETag, а Last-Modified
+    # не раньше начала месяца, иначе после смены месяца клиент получил бы 304 со старым
+    month = comparison.current_month(date.today())
+    defaulted = start_date is None or end_date is None
+    start_date = start_date or month.date_from
+    end_date = end_date or month.date_to
+    not_modified = conditional_response(
+        request, response, user, start_date, end_date,
+        valid_from=datetime.combine(month.date_from, datetime.min.time()) if defaulted else None,
+    )
+    if not_modified:
+        return not_modified
+
+    if start_date > end_date:
+        raise HTTPException(status_code=422, detail="start_date must not be after end_date")
+    specs = list(dict.fromkeys(compare))
+    if len(specs) > comparison.MAX_PERIODS:
+        raise HTTPException(status_code=422, detail=f"At most {comparison.MAX_PERIODS} comparison periods")
+
+    base = comparison.Period("base", start_date, end_date)
+    return comparison.compare(db, user.id, base, [comparison.resolve_period(spec, base) for spec in specs])
+
+
+def get_current_user(token: str, db: Session):
+    payload = verify_token(token)
+    user = get_user_by_email(db, payload.get("sub"))
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return user
+
+
+@router.post(
+    "/bulk",
+    response_model=TransactionBulkResult,
+    status_code=status.HTTP_201_CREATED,
+    summary="Импорт пачки транзакций",
+)
+def create_transactions_bulk_route(
+    transactions: List[TransactionCreate],
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+    skip_duplicates: bool = Query(True, description="Пропускать дубликаты (иначе – сохранить с пометкой)"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+):
+    """
+    Импорт выписки. Дубликаты (тот же тип, сумма, дата, ИНН и счета) уже
+    сохранённых транзакций и строк внутри самой пачки пропускаются или помечаются.
+    Повтор с тем же Idempotency-Key получает первый ответ без повторной записи.
+    """
+    user = get_current_user(token, db)
+    return idempotency.run(
+        db, user.id, idempotency_key,
+        idempotency.request_hash("POST /transactions/bulk", {"skip_duplicates": skip_duplicates}, transactions),
+        status.HTTP_201_CREATED,
+        render=lambda result: _bulk_result(*result),
+        write=lambda idem: _bulk_result(*create_transactions_bulk(db, transactions, user.id, skip_duplicates, idem)),
+    )
+
+
+def _bulk_result(created, skipped) -> dict:
+    return {
+        "created": [TransactionOut.from_orm(row) for row in created],
+        "skipped": [{"index": i, "duplicate_of_id": dup} for i, dup in skipped],
+    }
+
+
+@router.get("/recurring", response_model=List[RecurringPaymentOut], summary="Регулярные платежи")
+def read_recurring(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_read_db),
+):
+    """Регулярные платежи, найденные пакетной задачей (python -m app.jobs.recurring)."""
+    user = get_current_user(token, db)
+    return (
+        db.query(RecurringPayment)
+        .filter(RecurringPayment.user_id == user.id)
+        .order_by(RecurringPayment.next_expected)
+        .all()
+    )
+
+
+@router.get("/changes", summary="Изменения после курсора (инкрементальная синхронизация)")
+def read_changes(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+    since: int = Query(0, ge=0, description="Курсор: next_cursor из прошлого ответа (0 – с начала)"),
+    limit: Optional[int] = Query(None, ge=1, description="Максимум записей журнала за один ответ"),
+):
+    """
+    Поток NDJSON: по строке на изменение –
+    `{"version", "op": "upsert"|"delete", "id", "transaction"}` (для delete transaction = null),
+    последней строкой – `{"next_cursor", "has_more"}`. Несколько изменений одной
+    транзакции внутри пачки сжимаются до последнего. Стоимость пропорциональна
+    числу изменений после курсора, а не размеру счёта.
+    Читается с основной БД: курсор не должен обгонять реплику.
+    """
+    user = get_current_user(token, db)
+
+    def stream():
+        cursor, has_more = since, False
+        for batch, cursor, has_more in changes.iter_batches(db, user.id, since, limit):
+            yield "".join(
+                json.dumps({
+                    "version": version,
+                    "op": op,
+                    "id": tx_id,
+                    "transaction": json.loads(TransactionOut.from_orm(tx).json()) if tx is not None else None,
+                }, ensure_ascii=False) + "\n"
+                for version, op, tx_id, tx in batch
+            )
+        yield json.dumps({"next_cursor": cursor, "has_more": has_more}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+def _user_id_from_token(token: str) -> int:
+    db = SessionLocal()
+    try:
+        return get_current_user(token, db).id
+    finally:
+        db.close()
+
+
+@router.get("/events", summary="Живые обновления дашборда (Server-Sent Events)")
+async def transaction_events(
+    request: Request,
+    token: Optional[str] = Query(None, description="JWT; EventSource не умеет передавать заголовки"),
+):
+    """
+    Поток событий создания / изменения / удаления транзакций текущего пользователя.
+    Каждое событие содержит дельты счётчиков (месяц, тип, статус, банки, категория, сумма),
+    поэтому открытый дашборд обновляет графики без повторных запросов статистики.
+    Событие `reload` означает, что дельты потеряны и статистику нужно перечитать.
+    """
+    if not token:
+        auth = request.headers.get("authorization", "")
+        token = auth[7:] if auth.lower().startswith("bearer ") else None
+    if not token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    user_id = await run_in_threadpool(_user_id_from_token, token)
+
+    subscription = events.broker.subscribe(user_id)
+    queue = subscription[1]
+
+    async def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    payload = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"     # держим соединение через прокси
+                    continue
+                yield f"event: {payload['op']}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+        finally:
+            events.broker.unsubscribe(user_id, subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ─────────── CRUD по одной транзакции (маршруты с {id} – в конце файла) ───────────
+@router.post("/", response_model=TransactionOut, status_code=status.HTTP_201_CREATED, summary="Создать транзакцию")
+def create_transaction_route(
+    transaction: TransactionCreate,
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+    skip_duplicates: bool = Query(False, description="Отклонить дубликат с 409 вместо пометки"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+):
+    """Повтор с тем же Idempotency-Key получает первый ответ без повторной записи."""
+    user = get_current_user(token, db)
+    return idempotency.run(
+        db, user.id, idempotency_key,
+        idempotency.request_hash("POST /transactions/", {"skip_duplicates": skip_duplicates}, transaction),
+        status.HTTP_201_CREATED,
+        render=TransactionOut.from_orm,
+        write=lambda idem: create_transaction(db, transaction, user.id, skip_duplicates, idem),
+    )
+
+
+@router.get("/{transaction_id}", response_model=TransactionOut, summary="Получить транзакцию")
+def read_transaction(
+    transaction_id: int,
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+):
+    user = get_current_user(token, db)
+    transaction = get_transaction_by_id(db, transaction_id, user.id)
+    if not transaction:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Transaction not found")
+    return transaction
+
+
+@router.put("/{transaction_id}", response_model=TransactionOut, summary="Изменить транзакцию")
+def update_transaction_route(
+    transaction_id: int,
+    transaction: TransactionUpdate,
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+):
+    user = get_current_user(token, db)
+    return update_transaction(db, transaction_id, transaction, user.id)
+
+
+@router.delete("/{transaction_id}", status_code=status.HTTP_204_NO_CONTENT, summary="Удалить транзакцию")
+def delete_transaction_route(
+    transaction_id: int,
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+):
+    user = get_current_user(token, db)
+    if not get_transaction_by_id(db, transaction_id, user.id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Transaction not found")
+    delete_transaction(db, transaction_id, user.id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
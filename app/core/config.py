@@ -1,6 +1,8 @@
 # app/core/config.py
 
-from pydantic import BaseSettings
+from typing import Optional
+
+from pydantic import BaseSettings, Field
 
 class Settings(BaseSettings):
     DATABASE_URL: str
@@ -8,8 +10,71 @@ class Settings(BaseSettings):
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
 
+    # Реплика для тяжёлых чтений (/transactions/stats, /reports); пусто – всё на основной БД
+    READ_DATABASE_URL: Optional[str] = None
+    REPLICA_MAX_LAG_SECONDS: float = 5
+    REPLICA_HEALTH_TTL_SECONDS: float = 2
+
+    # Потоковые выгрузки /reports (csv, arrow, parquet): строк в пачке
+    EXPORT_BATCH_SIZE: int = 5000
+
+    # Журнал изменений /transactions/changes: записей в пачке
+    CHANGES_BATCH_SIZE: int = 1000
+
+    # Ключи Idempotency-Key для POST /transactions/ и /transactions/bulk
+    IDEMPOTENCY_TTL_HOURS: int = 24
+
+    # Снимки транзакций в mmap-файлах для статистики без скана БД (app/services/snapshots.py)
+    SNAPSHOTS_ENABLED: bool = False      # включать вместе с app/jobs/snapshots.py
+    SNAPSHOT_DIR: str = "snapshots"
+    SNAPSHOT_MAX_OPEN: int = 256         # открытых отображений на процесс
+    SNAPSHOT_LOG_MAX_ROWS: int = 10000   # строк в журнале дельт до фонового слияния в снимок
+    SNAPSHOT_ACTIVE_DAYS: int = 30       # app/jobs/snapshots.py: пользователи с записями за N дней
+
+    # Ежемесячные выписки для всех пользователей (app/jobs/statements.py)
+    STATEMENTS_DIR: str = "statements"
+    STATEMENTS_WORKERS: int = 4
+    STATEMENTS_CHUNK_SIZE: int = 50      # пользователей на одну задачу пула
+    STATEMENTS_RUN_DAY: int = Field(1, ge=1, le=28)     # день месяца запуска (за прошлый месяц); есть в любом месяце
+    STATEMENTS_RUN_HOUR: int = Field(3, ge=0, le=23)    # час запуска, UTC
+    STATEMENTS_RETRY_ATTEMPTS: int = 5   # повторов упавшего прогона планировщика
+    STATEMENTS_RETRY_DELAY_SECONDS: float = 300   # первая пауза перед повтором, дальше удваивается
+
+    # Контроль допуска тяжёлых запросов (app/utils/admission.py), лимиты на процесс
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_REPORTS_CAPACITY: int = 8      # единиц стоимости одновременно (/reports)
+    ADMISSION_REPORTS_PER_USER: int = 2
+    ADMISSION_REPORTS_QUEUE: int = 16
+    ADMISSION_STATS_CAPACITY: int = 16       # /transactions/stats*
+    ADMISSION_STATS_PER_USER: int = 4
+    ADMISSION_STATS_QUEUE: int = 32
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 10
+    ADMISSION_ROWS_PER_UNIT: int = 50000     # строк отчёта на единицу стоимости
+
+    # Профилирование SQL (app/db/profiler.py)
+    QUERY_PROFILING: bool = True
+    SLOW_QUERY_MS: float = 200
+    SLOW_QUERY_EXPLAIN: bool = False     # EXPLAIN (ANALYZE, BUFFERS) повторно выполняет запрос
+    SLOW_QUERY_LOG_SIZE: int = 200
+    QUERY_BUDGET_COUNT: int = 30         # запросов к БД на один HTTP-запрос
+    QUERY_BUDGET_MS: float = 1000        # суммарное время запросов к БД на один HTTP-запрос
+    DEBUG_ENDPOINTS: bool = False        # /debug/* (журнал медленных запросов)
+    DEBUG_ADMIN_EMAILS: str = ""         # через запятую – кому доступны /debug/*
+
+    # Мониторинг транзакций (app/services/monitoring.py)
+    MONITOR_RULES: str = "amount,velocity,new_counterparty,status_burst"
+    MONITOR_AMOUNT_THRESHOLD: float = 500000
+    MONITOR_VELOCITY_WINDOW_MINUTES: int = 60
+    MONITOR_VELOCITY_MAX: int = 5
+    MONITOR_BURST_WINDOW_MINUTES: int = 60
+    MONITOR_BURST_MAX: int = 3
+
+    # Поиск регулярных платежей (app/services/recurring.py)
+    RECURRING_MIN_OCCURRENCES: int = 3
+    RECURRING_AMOUNT_TOLERANCE: float = 0.15
+    RECURRING_INTERVAL_TOLERANCE: float = 0.2
+
     class Config:
         env_file = ".env"
 
 settings = Settings()
-
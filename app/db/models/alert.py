@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.db.base import Base
+
+
+class Alert(Base):
+    __tablename__ = "alerts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    transaction_id = Column(Integer, ForeignKey("transactions.id", ondelete="SET NULL"), nullable=True)
+    rule = Column(String, nullable=False)
+    message = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    acknowledged = Column(Boolean, default=False, nullable=False)
+
+    transaction = relationship("Transaction")
+
+    __table_args__ = (
+        Index("ix_alerts_user_created", "user_id", "created_at"),
+    )
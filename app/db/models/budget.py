@@ -0,0 +1,44 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.db.base import Base
+
+
+class Budget(Base):
+    """
+    Лимит расходов пользователя по категории за период (неделя, месяц, год).
+    Расход по периодам хранится в BudgetUsage и поддерживается сервисным слоем
+    при каждой записи транзакций (app/services/budgets.py).
+    """
+    __tablename__ = "budgets"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    category = Column(String, nullable=False)
+    category_key = Column(String, nullable=False)      # нормализованная категория для сопоставления
+    period = Column(String(8), nullable=False)          # week | month | year
+    limit_amount = Column(Float, nullable=False)
+    thresholds = Column(String, nullable=False, default="0.8,1")   # доли лимита для уведомлений
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    usage = relationship("BudgetUsage", cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "category_key", "period", name="uq_budgets_user_category_period"),
+    )
+
+
+class BudgetUsage(Base):
+    """Накопленный расход бюджета за один период"""
+    __tablename__ = "budget_usage"
+
+    id = Column(Integer, primary_key=True, index=True)
+    budget_id = Column(Integer, ForeignKey("budgets.id", ondelete="CASCADE"), nullable=False)
+    period_start = Column(DateTime, nullable=False)
+    spent = Column(Float, nullable=False, default=0)
+    tx_count = Column(Integer, nullable=False, default=0)
+    notified_level = Column(Float, nullable=False, default=0)   # последний порог, о котором уведомили
+
+    __table_args__ = (
+        UniqueConstraint("budget_id", "period_start", name="uq_budget_usage_budget_period"),
+    )
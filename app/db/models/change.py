@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, Index
+from datetime import datetime
+from app.db.base import Base
+
+
+class TransactionChange(Base):
+    """
+    Журнал изменений транзакций для инкрементальной синхронизации (/transactions/changes).
+    id – монотонная версия (курсор). Удаления остаются как tombstone (op="delete"),
+    поэтому transaction_id без внешнего ключа.
+    """
+    __tablename__ = "transaction_changes"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    transaction_id = Column(Integer, nullable=False)
+    op = Column(String(6), nullable=False)      # upsert | delete
+    changed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_transaction_changes_user_id_id", "user_id", "id"),
+    )
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index, UniqueConstraint
+from app.db.base import Base
+
+
+class Counterparty(Base):
+    """
+    Контрагент пользователя (по ИНН получателя) с накопленными итогами.
+    Итоги поддерживаются сервисным слоем при каждой записи транзакций
+    (app/services/counterparty.py), поэтому чтение не агрегирует transactions.
+    """
+    __tablename__ = "counterparties"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    inn = Column(String, nullable=False)
+    bank = Column(String, nullable=True)
+    account = Column(String, nullable=True)
+
+    tx_count = Column(Integer, nullable=False, default=0)
+    total_amount = Column(Float, nullable=False, default=0)
+    income_amount = Column(Float, nullable=False, default=0)
+    expense_amount = Column(Float, nullable=False, default=0)
+    first_seen = Column(DateTime, nullable=True)
+    last_seen = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "inn", name="uq_counterparties_user_inn"),
+        Index("ix_counterparties_user_total", "user_id", "total_amount"),
+        Index("ix_counterparties_user_count", "user_id", "tx_count"),
+    )
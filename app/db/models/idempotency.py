@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Index, UniqueConstraint
+from datetime import datetime
+from app.db.base import Base
+
+
+class IdempotencyKey(Base):
+    """
+    Ключ Idempotency-Key с сохранённым ответом: повтор запроса с тем же ключом
+    получает этот ответ без повторной записи (app/services/idempotency.py).
+    Строка пишется в той же транзакции БД, что и создаваемые транзакции.
+    """
+    __tablename__ = "idempotency_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    key = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False)    # sha256 маршрута, параметров и тела
+    status_code = Column(Integer, nullable=False)
+    response = Column(Text, nullable=False)               # тело ответа в JSON
+    response_hash = Column(String(64), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_key"),
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
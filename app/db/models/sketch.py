@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, DateTime, Boolean, Enum, ForeignKey, LargeBinary, Text, UniqueConstraint
+from datetime import datetime
+from app.db.base import Base
+from app.db.models.transaction import TransactionType
+
+
+class MonthlySketch(Base):
+    """
+    Скетчи распределения сумм пользователя за месяц по типу транзакций
+    (app/utils/sketches.py). Запись транзакции помечает затронутые месяцы stale,
+    пересборка – лениво при чтении (app/services/sketches.py).
+    """
+    __tablename__ = "monthly_sketches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    month = Column(DateTime, nullable=False)          # первое число месяца, 00:00
+    transaction_type = Column(Enum(TransactionType), nullable=False)
+
+    tx_count = Column(Integer, nullable=False, default=0)
+    digest = Column(Text, nullable=True)              # TDigest.to_dict() в JSON
+    hll = Column(LargeBinary, nullable=True)          # регистры HyperLogLog по ИНН
+    histogram = Column(Text, nullable=True)           # счётчики корзин Histogram в JSON
+    stale = Column(Boolean, nullable=False, default=True)
+    built_at = Column(DateTime, default=datetime.utcnow, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "month", "transaction_type", name="uq_monthly_sketches_user_month_type"),
+    )
@@ -1,8 +1,9 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from enum import Enum as PyEnum
 from app.db.base import Base
+from app.db.models.counterparty import Counterparty  # noqa: F401 – таблица для FK counterparty_id
 
 
 class PersonType(str, PyEnum):
@@ -43,6 +44,35 @@ class Transaction(Base):
     category = Column(String, nullable=True)
     recipient_phone = Column(String, nullable=True)
 
+    # Нормализованный отпечаток (app/utils/fingerprint.py) для поиска дубликатов
+    fingerprint = Column(String(40), nullable=True)
+    # Ссылка на ранее сохранённую транзакцию с тем же отпечатком
+    duplicate_of_id = Column(Integer, ForeignKey("transactions.id", ondelete="SET NULL"), nullable=True)
+
+    # Контрагент (агрегаты по ИНН получателя), см. app/db/models/counterparty.py
+    counterparty_id = Column(Integer, ForeignKey("counterparties.id"), nullable=True, index=True)
+
     # 🔗 Связь с пользователем
     user_id = Column(Integer, ForeignKey("users.id"))
     user = relationship("User", back_populates="transactions")
+
+    __table_args__ = (
+        Index("ix_transactions_user_fingerprint", "user_id", "fingerprint"),
+    )
+
+
+class RecurringPayment(Base):
+    """Регулярный платёж, найденный пакетной задачей app/jobs/recurring.py"""
+    __tablename__ = "recurring_payments"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    recipient_inn = Column(String, nullable=False)
+    transaction_type = Column(Enum(TransactionType), nullable=False)
+    occurrences = Column(Integer, nullable=False)
+    avg_amount = Column(Float, nullable=False)
+    interval_days = Column(Float, nullable=False)
+    first_date = Column(DateTime, nullable=False)
+    last_date = Column(DateTime, nullable=False)
+    next_expected = Column(DateTime, nullable=False)
+    detected_at = Column(DateTime, default=datetime.utcnow, nullable=False)
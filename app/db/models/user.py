@@ -1,6 +1,6 @@
 # app/db/models/user.py
 
-from sqlalchemy import Column, Integer, String, Boolean
+from sqlalchemy import Column, Integer, String, Boolean, DateTime
 from sqlalchemy.orm import relationship
 
 from app.db.session import Base
@@ -13,4 +13,9 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
 
+    # Версия данных пользователя: растёт на каждой записи транзакций,
+    # из неё строятся ETag / Last-Modified для списков и статистики
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")
+    data_updated_at = Column(DateTime, nullable=True)
+
     transactions = relationship("Transaction", back_populates="user")
@@ -0,0 +1,181 @@
+# app/db/profiler.py
+"""
+Профилировщик SQL на событиях SQLAlchemy.
+
+Для каждого HTTP-запроса считает число и суммарное время запросов к БД
+(заголовки Server-Timing / X-Query-Count) и отмечает запросы, превысившие
+QUERY_BUDGET_COUNT или QUERY_BUDGET_MS. SELECT'ы дольше SLOW_QUERY_MS после
+ответа клиенту уходят в фоновый поток, который снимает для них
+EXPLAIN (ANALYZE, BUFFERS) и кладёт в кольцевой буфер (см. /debug/slow-queries).
+ANALYZE выполняет запрос повторно, поэтому он включается явно (SLOW_QUERY_EXPLAIN),
+идёт в read-only транзакции с откатом и не трогает блокирующие SELECT ... FOR UPDATE
+и вызовы функций без FROM (SELECT pg_notify(...)).
+"""
+import logging
+import queue
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Кольцевые буферы для /debug/*
+slow_queries: deque = deque(maxlen=settings.SLOW_QUERY_LOG_SIZE)
+budget_violations: deque = deque(maxlen=settings.SLOW_QUERY_LOG_SIZE)
+
+
+class RequestProfile:
+    __slots__ = ("method", "path", "count", "total_ms", "slowest", "slow")
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest: List[tuple] = []   # (ms, sql) – пять самых долгих
+        self.slow: List[tuple] = []      # (engine, sql, params, ms) – кандидаты на EXPLAIN
+
+    def record(self, engine, statement, parameters, ms: float) -> None:
+        self.count += 1
+        self.total_ms += ms
+        self.slowest = sorted(self.slowest + [(ms, statement)], key=lambda x: -x[0])[:5]
+        if ms >= settings.SLOW_QUERY_MS:
+            self.slow.append((engine, statement, parameters, ms))
+
+    def over_budget(self) -> bool:
+        return self.count > settings.QUERY_BUDGET_COUNT or self.total_ms > settings.QUERY_BUDGET_MS
+
+
+_current: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+
+# ─────────────────────────── хуки SQLAlchemy ───────────────────────────
+@event.listens_for(Engine, "before_cursor_execute")
+def _before(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    ms = (time.perf_counter() - starts.pop()) * 1000
+    profile = _current.get()
+    if profile is not None:
+        profile.record(conn.engine, statement, None if executemany else parameters, ms)
+
+
+# ─────────────────────────── EXPLAIN в фоне ───────────────────────────
+_explain_queue: "queue.Queue[tuple]" = queue.Queue(maxsize=50)
+_explain_thread: Optional[threading.Thread] = None
+_explain_lock = threading.Lock()
+
+_LOCKING = re.compile(r"\bFOR\s+(NO\s+KEY\s+UPDATE|UPDATE|KEY\s+SHARE|SHARE)\b", re.IGNORECASE)
+_FROM = re.compile(r"\bFROM\b", re.IGNORECASE)
+
+
+def _explainable(statement: str) -> bool:
+    """Только чтение таблиц: без блокировок строк и без SELECT функции(...) с побочными эффектами"""
+    return (
+        statement.lstrip().upper().startswith("SELECT")
+        and _FROM.search(statement) is not None
+        and _LOCKING.search(statement) is None
+    )
+
+
+def _explain(engine, statement: str, parameters) -> Optional[str]:
+    if engine.dialect.name != "postgresql" or not settings.SLOW_QUERY_EXPLAIN:
+        return None
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            conn.exec_driver_sql("SET TRANSACTION READ ONLY")
+            rows = conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters or ()).fetchall()
+        finally:
+            trans.rollback()    # ANALYZE выполняет запрос – ничего не фиксируем
+    return "\n".join(r[0] for r in rows)
+
+
+def _explain_worker() -> None:
+    while True:
+        entry, engine, parameters = _explain_queue.get()
+        try:
+            entry["plan"] = _explain(engine, entry["sql"], parameters)
+        except Exception as exc:
+            entry["plan"] = f"EXPLAIN не удался: {exc}"
+        slow_queries.append(entry)
+
+
+def _submit_slow(profile: RequestProfile) -> None:
+    global _explain_thread
+    for engine, statement, parameters, ms in profile.slow:
+        entry = {
+            "at": datetime.utcnow().isoformat(),
+            "request": f"{profile.method} {profile.path}",
+            "duration_ms": round(ms, 2),
+            "sql": statement,
+            "params": repr(parameters),
+            "plan": None,
+        }
+        if not settings.SLOW_QUERY_EXPLAIN or not _explainable(statement):
+            slow_queries.append(entry)       # DML и блокирующие запросы повторно не выполняем
+            continue
+        with _explain_lock:
+            if _explain_thread is None:
+                _explain_thread = threading.Thread(target=_explain_worker, name="slow-query-explain", daemon=True)
+                _explain_thread.start()
+        try:
+            _explain_queue.put_nowait((entry, engine, parameters))
+        except queue.Full:
+            slow_queries.append(entry)       # EXPLAIN не успевает – пишем без плана
+
+
+# ─────────────────────────── ASGI middleware ───────────────────────────
+class QueryProfilerMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.QUERY_PROFILING:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"])
+        token = _current.set(profile)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-Query-Count"] = str(profile.count)
+                headers.append("Server-Timing", f'db;dur={profile.total_ms:.1f};desc="{profile.count} queries"')
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if profile.over_budget():
+                logger.warning(
+                    "Бюджет запросов превышен: %s %s – %d запросов, %.1f мс",
+                    profile.method, profile.path, profile.count, profile.total_ms,
+                )
+                budget_violations.append({
+                    "at": datetime.utcnow().isoformat(),
+                    "request": f"{profile.method} {profile.path}",
+                    "queries": profile.count,
+                    "total_ms": round(profile.total_ms, 2),
+                    "slowest": [{"duration_ms": round(ms, 2), "sql": sql} for ms, sql in profile.slowest],
+                })
+            if profile.slow:
+                _submit_slow(profile)
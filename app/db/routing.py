@@ -0,0 +1,110 @@
+# app/db/routing.py
+"""
+Маршрутизация чтений между основной БД и репликой (READ_DATABASE_URL).
+
+Read-only endpoint'ы берут сессию через get_read_db вместо get_db. Реплика
+используется, только если:
+  1) она доступна и отстаёт не больше REPLICA_MAX_LAG_SECONDS
+     (проверка кэшируется на REPLICA_HEALTH_TTL_SECONDS);
+  2) она уже видит последнюю запись пользователя (read-your-writes):
+     users.data_version на реплике не меньше, чем на основной БД.
+Иначе запрос обслуживает основная БД.
+"""
+import logging
+import threading
+import time
+
+from fastapi import Depends
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models.user import User
+from app.db.session import ReadSessionLocal, SessionLocal, read_engine
+from app.dependencies.oauth2 import oauth2_scheme
+from app.utils.security import verify_token
+
+logger = logging.getLogger(__name__)
+
+_health_lock = threading.Lock()
+_health = {"ok": False, "checked_at": 0.0}
+
+# Для PostgreSQL: отставание применения WAL; 0, если реплика всё применила
+# (иначе на простаивающей основной БД «отставание» росло бы без записей)
+_PG_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+def replica_lag_seconds() -> float:
+    with read_engine.connect() as conn:
+        if conn.dialect.name != "postgresql":
+            return 0.0     # например, SQLite-файл в тестах – отставания нет
+        return float(conn.execute(_PG_LAG_SQL).scalar() or 0)
+
+
+def replica_healthy() -> bool:
+    if read_engine is None:
+        return False
+    now = time.monotonic()
+    with _health_lock:
+        if now - _health["checked_at"] < settings.REPLICA_HEALTH_TTL_SECONDS:
+            return _health["ok"]
+    try:
+        lag = replica_lag_seconds()
+        ok = lag <= settings.REPLICA_MAX_LAG_SECONDS
+        if not ok:
+            logger.warning("Реплика отстаёт на %.1f с – чтения идут на основную БД", lag)
+    except Exception:
+        logger.exception("Реплика недоступна – чтения идут на основную БД")
+        ok = False
+    with _health_lock:
+        _health.update(ok=ok, checked_at=now)
+    return ok
+
+
+def _data_version(db: Session, email: str):
+    row = db.query(User.data_version).filter(User.email == email).first()
+    return row[0] if row else None
+
+
+def replica_has_user_writes(replica: Session, email: str) -> bool:
+    """Реплика видит все записи пользователя (сравнение users.data_version с основной БД)"""
+    primary = SessionLocal()
+    try:
+        expected = _data_version(primary, email)
+    finally:
+        primary.close()
+    actual = _data_version(replica, email)
+    return expected is not None and actual is not None and actual >= expected
+
+
+def _mark_unhealthy() -> None:
+    with _health_lock:
+        _health.update(ok=False, checked_at=time.monotonic())
+
+
+def get_read_db(token: str = Depends(oauth2_scheme)):
+    """Сессия для read-only endpoint'ов: реплика, если она здорова и догнала пользователя"""
+    db = None
+    if replica_healthy():
+        email = verify_token(token).get("sub")
+        replica = ReadSessionLocal()
+        try:
+            if replica_has_user_writes(replica, email):
+                db = replica
+        except Exception:
+            logger.exception("Ошибка запроса к реплике – чтение идёт на основную БД")
+            _mark_unhealthy()
+        if db is None:
+            replica.close()
+    if db is None:
+        db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -9,4 +9,8 @@ SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 engine = create_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Реплика только для чтения (маршрутизация – app/db/routing.py)
+read_engine = create_engine(settings.READ_DATABASE_URL, pool_pre_ping=True) if settings.READ_DATABASE_URL else None
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine or engine)
+
 Base = declarative_base()
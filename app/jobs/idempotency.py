@@ -0,0 +1,22 @@
+# app/jobs/idempotency.py
+"""
+Очистка просроченных ключей Idempotency-Key.
+Запуск (например, из cron раз в час):  python -m app.jobs.idempotency
+"""
+import logging
+
+from app.db.session import SessionLocal
+from app.services.idempotency import purge_expired
+
+
+def run() -> int:
+    db = SessionLocal()
+    try:
+        return purge_expired(db)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"Удалено просроченных ключей: {run()}")
@@ -0,0 +1,33 @@
+# app/jobs/recurring.py
+"""
+Пакетный поиск регулярных платежей по всем пользователям.
+Запуск (например, из cron раз в сутки):  python -m app.jobs.recurring
+"""
+import logging
+
+from app.db.session import SessionLocal
+from app.db.models.user import User
+from app.services.recurring import refresh_user
+
+logger = logging.getLogger(__name__)
+
+
+def run() -> int:
+    db = SessionLocal()
+    try:
+        user_ids = [uid for (uid,) in db.query(User.id).filter(User.is_active.isnot(False)).order_by(User.id)]
+        total = 0
+        for user_id in user_ids:
+            try:
+                total += len(refresh_user(db, user_id))
+            except Exception:
+                db.rollback()
+                logger.exception("recurring: ошибка для пользователя %s", user_id)
+        return total
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"Найдено регулярных платежей: {run()}")
@@ -0,0 +1,45 @@
+# app/jobs/snapshots.py
+"""
+Прогрев снимков транзакций (app/services/snapshots.py) для активных пользователей:
+строит отсутствующие, догоняет устаревшие и сливает журналы дельт в базовые
+снимки, чтобы на пути запроса оставалась только дозапись небольших дельт.
+Запуск (например, из cron каждые 10 минут и при деплое):  python -m app.jobs.snapshots
+"""
+import logging
+from datetime import datetime, timedelta
+
+from app.core.config import settings
+from app.db.models.user import User
+from app.db.session import SessionLocal
+from app.services import snapshots
+
+logger = logging.getLogger(__name__)
+
+
+def run() -> int:
+    db = SessionLocal()
+    try:
+        since = datetime.utcnow() - timedelta(days=settings.SNAPSHOT_ACTIVE_DAYS)
+        users = (
+            db.query(User)
+            .filter(User.is_active.isnot(False), User.data_updated_at >= since)
+            .order_by(User.id)
+            .all()
+        )
+        ready = 0
+        for user in users:
+            try:
+                snapshots.warm(db, user)
+                ready += 1
+            except Exception:
+                db.rollback()
+                logger.exception("snapshots: ошибка для пользователя %s", user.id)
+            db.expunge_all()
+        return ready
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"Актуальных снимков: {run()}")
@@ -0,0 +1,214 @@
+# app/jobs/statements.py
+"""
+Пакетная генерация ежемесячных выписок (PDF и XLSX) для всех пользователей.
+
+    python -m app.jobs.statements --month 2026-09          # один прогон
+    python -m app.jobs.statements --schedule               # планировщик: каждый месяц за прошлый
+
+Пользователи режутся на пачки и раздаются пулу процессов. Каждый процесс один раз
+при старте регистрирует шрифт и открывает свои соединения с БД, а месяц пользователя
+читает одним запросом по диапазону дат. Готовые пачки пишутся в контрольный файл
+<out>/<YYYY-MM>/_done.txt, повторный запуск пропускает уже обработанных.
+Планировщик повторяет упавший прогон с экспоненциальной паузой
+(STATEMENTS_RETRY_ATTEMPTS, STATEMENTS_RETRY_DELAY_SECONDS) – дообрабатываются
+только пачки, которых нет в контрольном файле.
+"""
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import List, Set, Tuple
+
+from app.core.config import settings
+from app.db.models.transaction import Transaction
+from app.db.session import SessionLocal, engine
+from app.services.reports import build_dataframe, register_font, render_pdf, render_xlsx
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT = "_done.txt"
+
+
+class StatementsIncomplete(RuntimeError):
+    """Часть пачек не обработана – повторный запуск доделает только их"""
+
+
+def month_range(month: str) -> Tuple[datetime, datetime]:
+    start = datetime.strptime(month, "%Y-%m")
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return start, end
+
+
+def previous_month(now: datetime) -> str:
+    first = now.replace(day=1)
+    return (first.replace(year=first.year - 1, month=12) if first.month == 1
+            else first.replace(month=first.month - 1)).strftime("%Y-%m")
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+# ─────────────────────────── воркер ───────────────────────────
+def _init_worker() -> None:
+    # соединения родителя после fork не используем; шрифт – один раз на процесс
+    engine.dispose(close=False)
+    register_font()
+
+
+def render_chunk(user_ids: List[int], month: str, out_dir: str, formats: Tuple[str, ...]) -> List[int]:
+    start, end = month_range(month)
+    target = Path(out_dir) / month
+    db = SessionLocal()
+    try:
+        for user_id in user_ids:
+            data = (
+                db.query(Transaction)
+                .filter(
+                    Transaction.user_id == user_id,
+                    Transaction.duplicate_of_id.is_(None),
+                    Transaction.date_time >= start,
+                    Transaction.date_time < end,
+                )
+                .order_by(Transaction.date_time, Transaction.id)
+                .all()
+            )
+            if not data:
+                continue
+            df = build_dataframe(data)
+            if "xlsx" in formats:
+                _write_atomic(target / f"statement_{user_id}_{month}.xlsx", render_xlsx(df).getvalue())
+            if "pdf" in formats:
+                _write_atomic(target / f"statement_{user_id}_{month}.pdf", render_pdf(df).getvalue())
+            db.expunge_all()
+    finally:
+        db.close()
+    return user_ids
+
+
+# ─────────────────────────── координатор ───────────────────────────
+def _load_checkpoint(path: Path) -> Set[int]:
+    if not path.exists():
+        return set()
+    return {int(line) for line in path.read_text().split() if line.strip()}
+
+
+def _users_with_activity(month: str) -> List[int]:
+    start, end = month_range(month)
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(Transaction.user_id)
+            .filter(
+                Transaction.user_id.isnot(None),
+                Transaction.duplicate_of_id.is_(None),     # тот же отбор, что и в render_chunk
+                Transaction.date_time >= start,
+                Transaction.date_time < end,
+            )
+            .distinct()
+            .order_by(Transaction.user_id)
+            .all()
+        )
+        return [uid for (uid,) in rows]
+    finally:
+        db.close()
+
+
+def run(month: str, out_dir: str = None, workers: int = None, formats: Tuple[str, ...] = ("pdf", "xlsx")) -> int:
+    out_dir = out_dir or settings.STATEMENTS_DIR
+    workers = workers or settings.STATEMENTS_WORKERS
+    target = Path(out_dir) / month
+    target.mkdir(parents=True, exist_ok=True)
+    checkpoint = target / CHECKPOINT
+
+    done = _load_checkpoint(checkpoint)
+    pending = [uid for uid in _users_with_activity(month) if uid not in done]
+    if not pending:
+        logger.info("Выписки за %s: всё уже готово", month)
+        return 0
+
+    size = settings.STATEMENTS_CHUNK_SIZE
+    chunks = [pending[i:i + size] for i in range(0, len(pending), size)]
+    logger.info("Выписки за %s: %d пользователей, %d пачек, %d процессов", month, len(pending), len(chunks), workers)
+
+    processed, failed = 0, 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool, \
+            open(checkpoint, "a") as log:
+        futures = {pool.submit(render_chunk, chunk, month, out_dir, formats): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            try:
+                user_ids = future.result()
+            except Exception:
+                logger.exception("Пачка %s не обработана – будет повторена при следующем запуске", futures[future][:3])
+                failed += 1
+                continue
+            log.write("".join(f"{uid}\n" for uid in user_ids))
+            log.flush()
+            os.fsync(log.fileno())
+            processed += len(user_ids)
+    if failed:
+        raise StatementsIncomplete(f"Выписки за {month}: {failed} из {len(chunks)} пачек не обработаны")
+    return processed
+
+
+def _next_run(now: datetime) -> datetime:
+    candidate = now.replace(day=settings.STATEMENTS_RUN_DAY, hour=settings.STATEMENTS_RUN_HOUR,
+                            minute=0, second=0, microsecond=0)
+    if candidate <= now:
+        candidate = (candidate.replace(year=candidate.year + 1, month=1) if candidate.month == 12
+                     else candidate.replace(month=candidate.month + 1))
+    return candidate
+
+
+def run_with_retry(month: str, out_dir: str = None, workers: int = None) -> None:
+    """Прогон с повторами: пауза STATEMENTS_RETRY_DELAY_SECONDS, удваивается после каждой неудачи"""
+    delay = settings.STATEMENTS_RETRY_DELAY_SECONDS
+    for attempt in range(settings.STATEMENTS_RETRY_ATTEMPTS + 1):
+        try:
+            run(month, out_dir, workers)
+            return
+        except Exception:
+            if attempt == settings.STATEMENTS_RETRY_ATTEMPTS:
+                logger.exception("Выписки за %s: прогон упал, повторы исчерпаны – ждём следующего цикла", month)
+                return
+            logger.exception("Выписки за %s: прогон упал, повтор %d через %.0f с",
+                             month, attempt + 1, delay)
+        time.sleep(delay)
+        delay *= 2
+
+
+def schedule(out_dir: str = None, workers: int = None) -> None:
+    """Бесконечный цикл: в STATEMENTS_RUN_DAY/STATEMENTS_RUN_HOUR генерирует выписки за прошлый месяц"""
+    while True:
+        run_at = _next_run(datetime.utcnow())
+        logger.info("Следующий запуск выписок: %s UTC", run_at)
+        while (delay := (run_at - datetime.utcnow()).total_seconds()) > 0:
+            time.sleep(min(delay, 3600))
+        run_with_retry(previous_month(run_at), out_dir, workers)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ежемесячные выписки для всех пользователей")
+    parser.add_argument("--month", help="YYYY-MM (по умолчанию – прошлый месяц)")
+    parser.add_argument("--out", default=settings.STATEMENTS_DIR)
+    parser.add_argument("--workers", type=int, default=settings.STATEMENTS_WORKERS)
+    parser.add_argument("--formats", default="pdf,xlsx")
+    parser.add_argument("--schedule", action="store_true", help="работать как планировщик")
+    args = parser.parse_args()
+
+    if args.schedule:
+        schedule(args.out, args.workers)
+        return
+    month = args.month or previous_month(datetime.utcnow())
+    formats = tuple(f.strip() for f in args.formats.split(",") if f.strip())
+    print(f"Готово выписок за {month}: {run(month, args.out, args.workers, formats)}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -1,6 +1,5 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Request
 from fastapi.responses import FileResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
@@ -10,6 +9,15 @@ from app.services.auth import get_user_by_email
 from app.utils.security import verify_token
 from app.api import transactions
 from app.api import reports
+from app.api import alerts
+from app.api import counterparties
+from app.api import debug
+from app.api import reconciliation
+from app.api import budgets
+from app.db.profiler import QueryProfilerMiddleware
+from app.utils.static import PrecompressedStaticFiles
+from app.utils.http_cache import StreamingAwareGZipMiddleware
+from app.services import events
 
 app = FastAPI()
 
@@ -22,8 +30,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Статичные файлы
-app.mount("/static", StaticFiles(directory="frontend"), name="static")
+# Сжатие ответов API (маленькие ответы, уже сжатые файлы и SSE не трогаются)
+app.add_middleware(StreamingAwareGZipMiddleware, minimum_size=1000)
+
+# Число / время SQL-запросов на HTTP-запрос, журнал медленных запросов (/debug/*)
+app.add_middleware(QueryProfilerMiddleware)
+
+# Статичные файлы (+ заранее сжатые .gz: python -m app.utils.static frontend)
+pages = PrecompressedStaticFiles(directory="frontend")
+app.mount("/static", pages, name="static")
+
+
+async def page(request: Request, name: str):
+    """HTML-страница через тот же StaticFiles: ETag/Last-Modified, 304 и .gz"""
+    return await pages.get_response(name, request.scope)
 
 # Подключаем роуты
 app.include_router(auth.router)
@@ -32,14 +52,31 @@ app.include_router(transactions.router, prefix="/transactions", tags=["Transacti
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
 app.include_router(reports.router, tags=["Reports"])
+app.include_router(alerts.router, prefix="/alerts", tags=["Alerts"])
+app.include_router(counterparties.router, prefix="/counterparties", tags=["Counterparties"])
+app.include_router(reconciliation.router, prefix="/reconciliation", tags=["Reconciliation"])
+app.include_router(budgets.router, prefix="/budgets", tags=["Budgets"])
+app.include_router(debug.router, prefix="/debug", tags=["Debug"])
+
+# Слушатель LISTEN/NOTIFY для живых обновлений дашборда (только PostgreSQL)
+@app.on_event("startup")
+def start_events_listener():
+    events.start_listener()
+
+
+@app.on_event("shutdown")
+def stop_events_listener():
+    events.stop_listener()
+
+
 @app.get("/")
-async def root():
-    return FileResponse("frontend/index.html")
+async def root(request: Request):
+    return await page(request, "index.html")
 
 
 @app.get("/auth")
-async def unified_auth_page():
-    return FileResponse("frontend/auth.html")
+async def unified_auth_page(request: Request):
+    return await page(request, "auth.html")
 
 @app.get("/login")
 async def redirect_login():
@@ -51,12 +88,12 @@ async def redirect_register():
 
 # Вместо него заводим отдельный путь для HTML-страницы
 @app.get("/transactions_page", response_class=FileResponse)
-async def transactions_page():
-    return FileResponse("frontend/transactions.html")
+async def transactions_page(request: Request):
+    return await page(request, "transactions.html")
 
 @app.get("/add_transaction")
-async def add_transaction_page():
-    return FileResponse("frontend/add_transaction.html")
+async def add_transaction_page(request: Request):
+    return await page(request, "add_transaction.html")
 
 
 @app.get("/profile")
@@ -73,13 +110,13 @@ def get_profile(token: str = Depends(oauth2_scheme)):
         raise HTTPException(status_code=403, detail="Invalid token or not authenticated")
 
 @app.get("/edit_transaction/{transaction_id}", response_class=FileResponse)
-async def edit_transaction_page(transaction_id: int):
+async def edit_transaction_page(transaction_id: int, request: Request):
     """
     HTML‑страница с формой редактирования.
     Доступна по URL: /edit_transaction/42
     """
-    return FileResponse("frontend/edit_transaction.html")
+    return await page(request, "edit_transaction.html")
 
 @app.get("/dashboard", response_class=FileResponse)
-async def dashboard_page():
-    return FileResponse("frontend/dashboard.html")
\ No newline at end of file
+async def dashboard_page(request: Request):
+    return await page(request, "dashboard.html")
\ No newline at end of file
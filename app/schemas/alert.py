@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+
+class AlertOut(BaseModel):
+    id: int
+    transaction_id: Optional[int]
+    rule: str
+    message: str
+    created_at: datetime
+    acknowledged: bool
+
+    class Config:
+        orm_mode = True
@@ -0,0 +1,45 @@
+from pydantic import BaseModel, Field, validator
+from typing import List, Optional
+from datetime import datetime
+
+
+def _check_thresholds(value: Optional[List[float]]) -> Optional[List[float]]:
+    if value is not None and not value:
+        raise ValueError("At least one threshold is required")
+    return value
+
+
+class BudgetCreate(BaseModel):
+    category: str = Field(..., min_length=1, max_length=255)
+    period: str = Field("month", regex="^(week|month|year)$")
+    limit_amount: float = Field(..., gt=0)
+    thresholds: List[float] = Field([0.8, 1.0], description="Доли лимита, при достижении которых создаётся алерт")
+
+    _thresholds = validator("thresholds", allow_reuse=True)(_check_thresholds)
+
+    @validator("category")
+    def category_not_blank(cls, value: str) -> str:
+        if not value.strip():
+            raise ValueError("Category must not be blank")
+        return value
+
+
+class BudgetUpdate(BaseModel):
+    limit_amount: Optional[float] = Field(None, gt=0)
+    thresholds: Optional[List[float]]
+
+    _thresholds = validator("thresholds", allow_reuse=True)(_check_thresholds)
+
+
+class BudgetOut(BaseModel):
+    id: int
+    category: str
+    period: str
+    limit_amount: float
+    thresholds: List[float]
+    period_start: datetime
+    period_end: datetime
+    spent: float
+    tx_count: int
+    remaining: float            # отрицательный – лимит превышен
+    used_ratio: Optional[float]
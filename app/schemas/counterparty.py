@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+
+class CounterpartyOut(BaseModel):
+    id: int
+    inn: str
+    bank: Optional[str]
+    account: Optional[str]
+    tx_count: int
+    total_amount: float
+    income_amount: float
+    expense_amount: float
+    first_seen: Optional[datetime]
+    last_seen: Optional[datetime]
+
+    class Config:
+        orm_mode = True
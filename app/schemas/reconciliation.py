@@ -0,0 +1,47 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+
+from app.schemas.transaction import TransactionStatus
+
+
+class StatementLineOut(BaseModel):
+    line: int
+    date_time: datetime
+    amount: float
+    recipient_inn: str
+    reference: Optional[str]
+
+
+class ReconciledTransaction(BaseModel):
+    id: int
+    date_time: datetime
+    amount: float
+    recipient_inn: str
+    status: TransactionStatus
+
+
+class ReconciliationMatch(BaseModel):
+    statement: StatementLineOut
+    transaction: ReconciledTransaction
+
+
+class ReconciliationResult(BaseModel):
+    period_from: Optional[datetime]
+    period_to: Optional[datetime]
+    matched_count: int
+    missing_count: int
+    extra_count: int
+    matched: List[ReconciliationMatch]
+    missing: List[StatementLineOut]     # есть в выписке, нет в системе
+    extra: List[ReconciledTransaction]  # есть в системе, нет в выписке
+
+
+class StatusUpdateRequest(BaseModel):
+    transaction_ids: List[int] = Field(..., min_items=1, max_items=100000)
+    to_status: TransactionStatus = TransactionStatus.completed
+    from_status: Optional[TransactionStatus] = TransactionStatus.confirmed
+
+
+class StatusUpdateResult(BaseModel):
+    updated: List[int]
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, validator
+from typing import List, Optional
 from datetime import datetime
 from enum import Enum
 
@@ -39,6 +39,13 @@ class TransactionBase(BaseModel):
     category: Optional[str]
     recipient_phone: Optional[str] = Field(None, pattern=r"^(\+7|8)\d{10}$")
 
+    @validator("person_type", "date_time", "amount", "status", "recipient_inn")
+    def not_null(cls, value):
+        # поле можно не передавать, но обнулить обязательное поле нельзя
+        if value is None:
+            raise ValueError("Field must not be null")
+        return value
+
 
 class TransactionCreate(TransactionBase):
     pass
@@ -46,6 +53,31 @@ class TransactionCreate(TransactionBase):
 
 class TransactionOut(TransactionBase):
     id: int
+    duplicate_of_id: Optional[int]
+
+    class Config:
+        orm_mode = True
+
+
+class SkippedTransaction(BaseModel):
+    index: int              # позиция в присланном списке
+    duplicate_of_id: int    # уже сохранённая транзакция с тем же отпечатком
+
+
+class TransactionBulkResult(BaseModel):
+    created: List[TransactionOut]
+    skipped: List[SkippedTransaction]
+
+
+class RecurringPaymentOut(BaseModel):
+    recipient_inn: str
+    transaction_type: TransactionType
+    occurrences: int
+    avg_amount: float
+    interval_days: float
+    first_date: datetime
+    last_date: datetime
+    next_expected: datetime
 
     class Config:
         orm_mode = True
@@ -64,3 +96,10 @@ class TransactionUpdate(BaseModel):
     recipient_account: Optional[str]
     category: Optional[str]
     recipient_phone: Optional[str] = Field(None, pattern=r"^(\+7|8)\d{10}$")
+
+    @validator("person_type", "date_time", "amount", "status", "recipient_inn")
+    def not_null(cls, value):
+        # поле можно не передавать, но обнулить обязательное поле нельзя
+        if value is None:
+            raise ValueError("Field must not be null")
+        return value
@@ -0,0 +1,245 @@
+# app/services/budgets.py
+"""
+Бюджеты: лимиты расходов по категориям за неделю / месяц / год.
+
+Расход периода хранится в budget_usage и меняется сервисным слоем транзакций
+в той же транзакции БД, что и запись («минус старое состояние, плюс новое»),
+поэтому статус бюджета читается по ключу (budget_id, начало периода) без
+агрегации транзакций. Учитываются списания, кроме отменённых, удалённых, возвратов
+и помеченных дубликатами.
+Пересечение порога (по умолчанию 80% и 100% лимита) создаёт алерт с rule="budget".
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db.models.alert import Alert
+from app.db.models.budget import Budget, BudgetUsage
+from app.db.models.transaction import Transaction, TransactionStatus, TransactionType
+from app.db.models.user import User
+from app.services.tx_state import TxState
+
+PERIODS = ("week", "month", "year")
+EXCLUDED_STATUSES = (TransactionStatus.canceled, TransactionStatus.deleted, TransactionStatus.refund)
+
+
+def category_key(category: Optional[str]) -> str:
+    return (category or "").strip().lower()
+
+
+def period_start(dt: datetime, period: str) -> datetime:
+    day = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "year":
+        return day.replace(month=1, day=1)
+    return day.replace(day=1)
+
+
+def period_end(start: datetime, period: str) -> datetime:
+    if period == "week":
+        return start + timedelta(days=7)
+    if period == "year":
+        return start.replace(year=start.year + 1)
+    return start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+
+
+def parse_thresholds(budget: Budget) -> List[float]:
+    return sorted(float(t) for t in budget.thresholds.split(",") if t.strip())
+
+
+def level_of(budget: Budget, spent: float) -> float:
+    """Наибольший достигнутый порог (доля лимита), 0 – ни одного"""
+    reached = [t for t in parse_thresholds(budget) if spent >= t * budget.limit_amount]
+    return max(reached, default=0.0)
+
+
+def _counted(state: TxState) -> bool:
+    return (
+        not state.duplicate
+        and state.transaction_type == TransactionType.expense
+        and state.status not in EXCLUDED_STATUSES
+        and bool(category_key(state.category))
+        and state.date_time is not None
+    )
+
+
+def _aggregate(db: Session, user_id: int, budget: Budget, start: datetime, exclude_ids: Iterable[int] = ()) -> Tuple[float, int]:
+    """Расход по транзакциям за период – только для инициализации строки budget_usage"""
+    q = db.query(func.coalesce(func.sum(Transaction.amount), 0), func.count(Transaction.id)).filter(
+        Transaction.user_id == user_id,
+        Transaction.duplicate_of_id.is_(None),
+        Transaction.transaction_type == TransactionType.expense,
+        Transaction.status.notin_(EXCLUDED_STATUSES),
+        func.lower(func.trim(Transaction.category)) == budget.category_key,
+        Transaction.date_time >= start,
+        Transaction.date_time < period_end(start, budget.period),
+    )
+    exclude_ids = list(exclude_ids)
+    if exclude_ids:
+        q = q.filter(Transaction.id.notin_(exclude_ids))
+    spent, count = q.one()
+    return float(spent), int(count)
+
+
+def _message(budget: Budget, usage: BudgetUsage) -> str:
+    return (
+        f"Бюджет «{budget.category}» ({budget.period}, с {usage.period_start:%d.%m.%Y}): "
+        f"израсходовано {usage.spent:.2f} из {budget.limit_amount:.2f} "
+        f"({usage.spent / budget.limit_amount * 100:.0f}%)"
+    )
+
+
+# ─────────────────────────── запись транзакций ───────────────────────────
+def apply(db: Session, user_id: int, added: Iterable[TxState] = (), removed: Iterable[TxState] = ()) -> List[Alert]:
+    """
+    Применяет добавленные / удалённые состояния транзакций к расходу бюджетов.
+    Вызывать после flush и touch_user_data (строка users заблокирована до commit,
+    поэтому записи одного пользователя применяются по очереди), до commit.
+    Возвращает созданные алерты о пересечении порогов.
+    """
+    added, removed = list(added), list(removed)
+    touched_ids = {s.id for s in added + removed if s.id is not None}
+    added = [s for s in added if _counted(s)]
+    removed = [s for s in removed if _counted(s)]
+    if not added and not removed:
+        return []
+
+    budgets = (
+        db.query(Budget)
+        .filter(Budget.user_id == user_id, Budget.category_key.in_({category_key(s.category) for s in added + removed}))
+        .all()
+    )
+    if not budgets:
+        return []
+    by_category = defaultdict(list)
+    for budget in budgets:
+        by_category[budget.category_key].append(budget)
+
+    # (budget_id, начало периода) -> [сумма, кол-во]; добавления и удаления раздельно
+    plus, minus, last_tx = defaultdict(lambda: [0.0, 0]), defaultdict(lambda: [0.0, 0]), {}
+    for states, target in ((removed, minus), (added, plus)):
+        for s in states:
+            for budget in by_category[category_key(s.category)]:
+                key = (budget.id, period_start(s.date_time, budget.period))
+                target[key][0] += s.amount
+                target[key][1] += 1
+                if target is plus:
+                    last_tx[key] = s.id
+
+    keys = set(plus) | set(minus)
+    usage = {
+        (u.budget_id, u.period_start): u
+        for u in db.query(BudgetUsage)
+        .filter(or_(*[and_(BudgetUsage.budget_id == b, BudgetUsage.period_start == p) for b, p in keys]))
+        .with_for_update()
+    }
+    budget_by_id = {b.id: b for b in budgets}
+
+    alerts = []
+    for key in keys:
+        budget = budget_by_id[key[0]]
+        row = usage.get(key)
+        if row is None:
+            # период ещё не заведён: база – транзакции периода без затронутых этой записью,
+            # к ней – только новые состояния (старые в базу не попали)
+            spent, count = _aggregate(db, user_id, budget, key[1], touched_ids)
+            row = BudgetUsage(budget_id=budget.id, period_start=key[1], spent=spent, tx_count=count,
+                              notified_level=level_of(budget, spent))
+            db.add(row)
+        else:
+            row.spent -= minus[key][0] if key in minus else 0
+            row.tx_count -= minus[key][1] if key in minus else 0
+        if key in plus:
+            row.spent += plus[key][0]
+            row.tx_count += plus[key][1]
+
+        level = level_of(budget, row.spent)
+        if level > row.notified_level:
+            alert = Alert(user_id=user_id, transaction_id=last_tx.get(key), rule="budget", message=_message(budget, row))
+            db.add(alert)
+            alerts.append(alert)
+        row.notified_level = level
+    return alerts
+
+
+# ─────────────────────────── бюджеты ───────────────────────────
+def create(db: Session, user_id: int, category: str, period: str, limit_amount: float, thresholds: List[float]) -> Budget:
+    """Создаёт бюджет и заводит расход текущего периода одним агрегирующим запросом"""
+    # та же блокировка строки users, что и у записи транзакций: расход периода
+    # считается без гонки с параллельной записью
+    db.query(User.id).filter(User.id == user_id).with_for_update().one()
+    budget = Budget(
+        user_id=user_id,
+        category=category.strip(),
+        category_key=category_key(category),
+        period=period,
+        limit_amount=limit_amount,
+        thresholds=",".join(f"{t:g}" for t in sorted(set(thresholds))),
+        created_at=datetime.utcnow(),
+    )
+    db.add(budget)
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Budget for this category and period already exists")
+
+    start = period_start(datetime.utcnow(), period)
+    spent, count = _aggregate(db, user_id, budget, start)
+    db.add(BudgetUsage(budget_id=budget.id, period_start=start, spent=spent, tx_count=count,
+                       notified_level=level_of(budget, spent)))
+    db.commit()
+    db.refresh(budget)
+    return budget
+
+
+def update(db: Session, budget: Budget, limit_amount: Optional[float], thresholds: Optional[List[float]]) -> Budget:
+    """Новый лимит / пороги; уровень уведомлений текущих периодов пересчитывается без алертов"""
+    if limit_amount is not None:
+        budget.limit_amount = limit_amount
+    if thresholds is not None:
+        budget.thresholds = ",".join(f"{t:g}" for t in sorted(set(thresholds)))
+    for row in db.query(BudgetUsage).filter(BudgetUsage.budget_id == budget.id):
+        row.notified_level = level_of(budget, row.spent)
+    db.commit()
+    db.refresh(budget)
+    return budget
+
+
+def statuses(db: Session, budgets: List[Budget], now: Optional[datetime] = None) -> List[dict]:
+    """Статус бюджетов за текущий период: одна выборка budget_usage по ключам (budget_id, начало периода)"""
+    if not budgets:
+        return []
+    now = now or datetime.utcnow()
+    starts = {b.id: period_start(now, b.period) for b in budgets}
+    usage: Dict[int, BudgetUsage] = {
+        u.budget_id: u
+        for u in db.query(BudgetUsage).filter(
+            or_(*[and_(BudgetUsage.budget_id == b_id, BudgetUsage.period_start == start) for b_id, start in starts.items()])
+        )
+    }
+    out = []
+    for budget in budgets:
+        row = usage.get(budget.id)
+        spent = row.spent if row else 0.0
+        start = starts[budget.id]
+        out.append({
+            "id": budget.id,
+            "category": budget.category,
+            "period": budget.period,
+            "limit_amount": budget.limit_amount,
+            "thresholds": parse_thresholds(budget),
+            "period_start": start,
+            "period_end": period_end(start, budget.period),
+            "spent": round(spent, 2),
+            "tx_count": row.tx_count if row else 0,
+            "remaining": round(budget.limit_amount - spent, 2),
+            "used_ratio": round(spent / budget.limit_amount, 4) if budget.limit_amount else None,
+        })
+    return out
@@ -0,0 +1,189 @@
+# app/services/comparison.py
+"""
+Сравнение периодов (/transactions/stats/compare).
+
+Все периоды считаются одним запросом: WHERE отбирает объединение диапазонов,
+а для каждого периода – условные агрегаты SUM(CASE WHEN <в периоде> ...).
+Суммы, как и в /transactions/stats, раздельно по поступлениям и списаниям.
+Разрезы (тип, статус, банки, категория, итог) на PostgreSQL – GROUPING SETS,
+т.е. один проход по строкам; на других СУБД – UNION ALL тех же агрегатов.
+"""
+import re
+from calendar import monthrange
+from datetime import date, datetime, timedelta
+from typing import Dict, List, NamedTuple
+
+from fastapi import HTTPException
+from sqlalchemy import Enum, String, and_, case, cast, func, literal, or_, tuple_, union_all
+from sqlalchemy.orm import Session
+
+from app.db.models.transaction import Transaction, TransactionType
+
+# Разрез ответа -> колонка группировки (total – итог без группировки)
+DIMENSIONS = {
+    "type": Transaction.transaction_type,
+    "status": Transaction.status,
+    "sender_bank": Transaction.sender_bank,
+    "recipient_bank": Transaction.recipient_bank,
+    "category": Transaction.category,
+}
+MAX_PERIODS = 6
+# Значения периода: кол-во и суммы по типам; порядок совпадает с колонками _aggregates
+MEASURES = ("count", "income", "expense")
+_RANGE = re.compile(r"^(\d{4}-\d{2}-\d{2})\.\.(\d{4}-\d{2}-\d{2})$")
+
+
+class Period(NamedTuple):
+    name: str
+    date_from: date
+    date_to: date       # включительно
+
+
+# ─────────────────────────── периоды ───────────────────────────
+def _is_whole_months(p_from: date, p_to: date) -> bool:
+    return p_from.day == 1 and p_to.day == monthrange(p_to.year, p_to.month)[1]
+
+
+def _shift_months(d: date, months: int, last_day: bool = False) -> date:
+    index = d.year * 12 + d.month - 1 + months
+    year, month = divmod(index, 12)
+    month += 1
+    days = monthrange(year, month)[1]
+    return date(year, month, days if last_day else min(d.day, days))
+
+
+def current_month(today: date) -> Period:
+    return Period("base", today.replace(day=1), today.replace(day=monthrange(today.year, today.month)[1]))
+
+
+def resolve_period(spec: str, base: Period) -> Period:
+    """
+    previous – такой же период непосредственно перед базовым (для целых месяцев –
+    предыдущие календарные месяцы), year_ago – те же даты год назад,
+    YYYY-MM-DD..YYYY-MM-DD – произвольный диапазон.
+    """
+    if spec == "previous":
+        if _is_whole_months(base.date_from, base.date_to):
+            months = (base.date_to.year - base.date_from.year) * 12 + base.date_to.month - base.date_from.month + 1
+            return Period(spec, _shift_months(base.date_from, -months), _shift_months(base.date_to, -months, last_day=True))
+        length = base.date_to - base.date_from + timedelta(days=1)
+        return Period(spec, base.date_from - length, base.date_to - length)
+    if spec == "year_ago":
+        last_day = _is_whole_months(base.date_from, base.date_to)
+        return Period(spec, _shift_months(base.date_from, -12), _shift_months(base.date_to, -12, last_day=last_day))
+    match = _RANGE.match(spec)
+    if match:
+        p_from, p_to = date.fromisoformat(match.group(1)), date.fromisoformat(match.group(2))
+        if p_from <= p_to:
+            return Period(spec, p_from, p_to)
+    raise HTTPException(status_code=422, detail=f"Invalid comparison period: {spec}")
+
+
+# ─────────────────────────── запрос ───────────────────────────
+def _in_period(period: Period):
+    return and_(
+        Transaction.date_time >= datetime.combine(period.date_from, datetime.min.time()),
+        Transaction.date_time < datetime.combine(period.date_to + timedelta(days=1), datetime.min.time()),
+    )
+
+
+def _aggregates(periods: List[Period]) -> list:
+    columns = []
+    for i, period in enumerate(periods):
+        cond = _in_period(period)
+        columns.append(func.sum(case((cond, 1), else_=0)).label(f"c{i}"))
+        for tx_type in (TransactionType.income, TransactionType.expense):
+            in_type = and_(cond, Transaction.transaction_type == tx_type)
+            columns.append(func.sum(case((in_type, Transaction.amount), else_=0)).label(f"{tx_type.name[0]}{i}"))
+    return columns
+
+
+def _rows(db: Session, user_id: int, periods: List[Period]):
+    """[(разрез, значение, c0, i0, e0, c1, i1, e1, ...)] одним запросом"""
+    where = (Transaction.user_id == user_id, Transaction.duplicate_of_id.is_(None), or_(*[_in_period(p) for p in periods]))
+    names, columns = list(DIMENSIONS), list(DIMENSIONS.values())
+
+    if db.get_bind().dialect.name == "postgresql":
+        # grouping(a, b, ...) – битовая маска: 1 = колонка не участвует в группировке
+        width = len(columns)
+        full = (1 << width) - 1
+        masks = {full & ~(1 << (width - 1 - i)): name for i, name in enumerate(names)}
+        masks[full] = "total"
+        rows = (
+            db.query(func.grouping(*columns), *columns, *_aggregates(periods))
+            .filter(*where)
+            .group_by(func.grouping_sets(*[tuple_(c) for c in columns], tuple_()))
+            .all()
+        )
+        result = []
+        for row in rows:
+            name = masks[row[0]]
+            key = None if name == "total" else row[1 + names.index(name)]
+            result.append((name, key, *row[1 + width:]))
+        return result
+
+    # в UNION колонка key одна на все разрезы – приводим к строке, перечисления разбираем обратно
+    selects = [
+        db.query(literal(name).label("dimension"), cast(column, String).label("key"), *_aggregates(periods))
+        .filter(*where)
+        .group_by(column)
+        for name, column in DIMENSIONS.items()
+    ]
+    selects.append(
+        db.query(literal("total").label("dimension"), literal(None, String).label("key"), *_aggregates(periods))
+        .filter(*where)
+    )
+    result = []
+    for name, key, *aggs in db.execute(union_all(*[q.statement for q in selects])).all():
+        column_type = DIMENSIONS[name].type if name in DIMENSIONS else None
+        if key is not None and isinstance(column_type, Enum):
+            key = column_type.enum_class[key]
+        result.append((name, key, *aggs))
+    return result
+
+
+def _delta(current: float, reference: float) -> dict:
+    return {
+        "delta": current - reference,
+        "delta_pct": round((current - reference) / reference * 100, 2) if reference else None,
+    }
+
+
+def _values(aggs, i: int) -> dict:
+    """count, income, expense i-го периода из строки _rows"""
+    count, income, expense = aggs[len(MEASURES) * i:len(MEASURES) * (i + 1)]
+    return {"count": int(count or 0), "income": float(income or 0), "expense": float(expense or 0)}
+
+
+def _with_changes(values: dict, base: dict) -> dict:
+    return {**values, **{f"{m}_change": _delta(base[m], values[m]) for m in MEASURES}}
+
+
+def compare(db: Session, user_id: int, base: Period, others: List[Period]) -> dict:
+    """
+    Значения (count, income, expense) каждого периода по разрезам и дельты сравниваемых
+    периодов относительно базового: delta = базовый - сравниваемый.
+    """
+    periods = [base, *others]
+    dimensions: Dict[str, List[dict]] = {"total": [], **{name: [] for name in DIMENSIONS}}
+    for name, key, *aggs in _rows(db, user_id, periods):
+        base_values = _values(aggs, 0)
+        values = {"base": base_values}
+        for i, period in enumerate(others, start=1):
+            values[period.name] = _with_changes(_values(aggs, i), base_values)
+        dimensions[name].append({"key": getattr(key, "value", key), **values})
+
+    for name in DIMENSIONS:
+        dimensions[name].sort(key=lambda item: (-item["base"]["expense"], -item["base"]["income"]))
+    if not dimensions["total"]:
+        empty = {"count": 0, "income": 0.0, "expense": 0.0}
+        dimensions["total"].append({
+            "key": None,
+            "base": empty,
+            **{p.name: _with_changes(empty, empty) for p in others},
+        })
+    return {
+        "periods": [{"name": "base" if i == 0 else p.name, "from": p.date_from, "to": p.date_to}
+                    for i, p in enumerate(periods)],
+        "dimensions": dimensions,
+    }
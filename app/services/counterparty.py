@@ -0,0 +1,112 @@
+# app/services/counterparty.py
+"""
+Поддержка накопленных итогов по контрагентам при записи транзакций.
+Вызывается сервисным слоем транзакций в той же транзакции БД, что и запись:
+изменение применяется как «минус старое состояние, плюс новое».
+"""
+from collections import defaultdict
+from typing import Dict, Iterable
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.db.models.counterparty import Counterparty
+from app.db.models.transaction import Transaction, TransactionType
+from app.services.tx_state import TxState
+
+
+def _load(db: Session, user_id: int, inns: Iterable[str]) -> Dict[str, Counterparty]:
+    inns = list(set(inns))
+    if not inns:
+        return {}
+    rows = (
+        db.query(Counterparty)
+        .filter(Counterparty.user_id == user_id, Counterparty.inn.in_(inns))
+        .with_for_update()
+        .all()
+    )
+    return {cp.inn: cp for cp in rows}
+
+
+def _recompute_bounds(db: Session, cp: Counterparty, exclude_ids: list, extra_dates: list) -> None:
+    """
+    first/last_seen после удаления граничной транзакции – индексный запрос по counterparty_id
+    без удаляемых строк, плюс даты добавляемых в этом же изменении.
+    """
+    first, last = (
+        db.query(func.min(Transaction.date_time), func.max(Transaction.date_time))
+        .filter(
+            Transaction.counterparty_id == cp.id,
+            Transaction.duplicate_of_id.is_(None),
+            Transaction.id.notin_(exclude_ids),
+        )
+        .one()
+    )
+    dates = [d for d in (first, last, *extra_dates) if d is not None]
+    cp.first_seen = min(dates) if dates else None
+    cp.last_seen = max(dates) if dates else None
+
+
+def apply(db: Session, user_id: int, added: Iterable[TxState] = (), removed: Iterable[TxState] = ()) -> Dict[str, Counterparty]:
+    """
+    Применяет добавленные / удалённые состояния транзакций к итогам контрагентов.
+    Все затронутые контрагенты читаются одним запросом (FOR UPDATE), новые создаются.
+    Возвращает {ИНН: Counterparty} для добавленных – чтобы проставить counterparty_id.
+    Вызывать после touch_user_data и до commit: FOR UPDATE не блокирует ещё не
+    существующую строку, от двойной вставки нового ИНН защищает блокировка пользователя.
+    Дубликаты получают контрагента, но в итоги не входят.
+    """
+    added, removed = list(added), list(removed)
+    cps = _load(db, user_id, [s.recipient_inn for s in added + removed])
+
+    bounds_dirty = set()
+    for s in removed:
+        if s.duplicate:
+            continue
+        cp = cps.get(s.recipient_inn)
+        if cp is None:
+            continue
+        cp.tx_count -= 1
+        cp.total_amount -= s.amount
+        if s.transaction_type == TransactionType.income:
+            cp.income_amount -= s.amount
+        else:
+            cp.expense_amount -= s.amount
+        if s.date_time in (cp.first_seen, cp.last_seen):
+            bounds_dirty.add(cp.inn)
+
+    by_inn = defaultdict(list)
+    for s in added:
+        by_inn[s.recipient_inn].append(s)
+    for inn, states in by_inn.items():
+        cp = cps.get(inn)
+        if cp is None:
+            cp = cps[inn] = Counterparty(
+                user_id=user_id, inn=inn, tx_count=0,
+                total_amount=0, income_amount=0, expense_amount=0,
+            )
+            db.add(cp)
+        for s in states:
+            if s.duplicate:
+                continue
+            cp.tx_count += 1
+            cp.total_amount += s.amount
+            if s.transaction_type == TransactionType.income:
+                cp.income_amount += s.amount
+            else:
+                cp.expense_amount += s.amount
+            if s.date_time and (cp.first_seen is None or s.date_time < cp.first_seen):
+                cp.first_seen = s.date_time
+            if s.date_time and (cp.last_seen is None or s.date_time >= cp.last_seen):
+                cp.last_seen = s.date_time
+                cp.bank = s.recipient_bank or cp.bank
+                cp.account = s.recipient_account or cp.account
+
+    if bounds_dirty:
+        removed_ids = [s.id for s in removed if s.id is not None]
+        for inn in bounds_dirty:
+            _recompute_bounds(db, cps[inn], removed_ids,
+                              [s.date_time for s in by_inn.get(inn, []) if not s.duplicate])
+    if added:
+        db.flush()   # id для новых контрагентов
+    return cps
@@ -0,0 +1,191 @@
+# app/services/events.py
+"""
+Живые обновления дашборда: события записи транзакций с дельтами агрегатов.
+
+Сервисный слой вызывает `publish` до commit. На PostgreSQL событие уходит
+через NOTIFY (доставляется только после commit и во все воркеры, каждый из
+которых слушает канал в фоновом потоке и раздаёт события своим подписчикам).
+На других СУБД событие раздаётся подписчикам текущего процесса после commit.
+Подписчики – открытые SSE-соединения (/transactions/events).
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.db.session import engine
+from app.services.tx_state import TxState
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "tx_events"
+# NOTIFY ограничивает payload 8000 байт; крупные пачки заменяются командой «перечитать»
+MAX_PAYLOAD = 7500
+QUEUE_SIZE = 100
+
+
+# ─────────────────────────── дельты ───────────────────────────
+def _month(dt) -> Optional[str]:
+    # тот же формат, что и period в /transactions/stats (date_trunc('month', ...))
+    return dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0).isoformat() if dt else None
+
+
+def _label(value):
+    return getattr(value, "value", value)
+
+
+def _change(state: TxState, sign: int) -> dict:
+    return {
+        "sign": sign,
+        "month": _month(state.date_time),
+        "type": _label(state.transaction_type),
+        "status": _label(state.status),
+        "sender_bank": state.sender_bank,
+        "recipient_bank": state.recipient_bank,
+        "category": state.category,
+        "amount": state.amount,
+    }
+
+
+def build_delta(op: str, before: List[TxState] = (), after: List[TxState] = ()) -> dict:
+    """
+    Событие = список изменений счётчиков: sign=-1 для старого состояния, +1 для нового.
+    Клиент прибавляет sign (и sign*amount) к соответствующим корзинам графиков.
+    Дубликаты в статистику не входят, поэтому изменений счётчиков не дают.
+    """
+    ids = sorted({s.id for s in [*before, *after] if s.id is not None})
+    return {
+        "op": op,
+        "ids": ids,
+        "changes": [_change(s, -1) for s in before if not s.duplicate]
+                   + [_change(s, +1) for s in after if not s.duplicate],
+    }
+
+
+# ─────────────────────── подписчики процесса ───────────────────────
+class Broker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subs: Dict[int, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = defaultdict(set)
+
+    def subscribe(self, user_id: int) -> Tuple[asyncio.AbstractEventLoop, asyncio.Queue]:
+        sub = (asyncio.get_running_loop(), asyncio.Queue(maxsize=QUEUE_SIZE))
+        with self._lock:
+            self._subs[user_id].add(sub)
+        return sub
+
+    def unsubscribe(self, user_id: int, sub) -> None:
+        with self._lock:
+            self._subs[user_id].discard(sub)
+            if not self._subs[user_id]:
+                del self._subs[user_id]
+
+    def dispatch(self, user_id: int, payload: dict) -> None:
+        """Потокобезопасно: вызывается из потоков пула, слушателя NOTIFY и т.п."""
+        with self._lock:
+            subs = list(self._subs.get(user_id, ()))
+        for loop, queue in subs:
+            loop.call_soon_threadsafe(_offer, queue, payload)
+
+
+def _offer(queue: asyncio.Queue, payload: dict) -> None:
+    if queue.full():
+        # клиент не успевает читать – дельты потеряны, пусть перечитает статистику
+        while not queue.empty():
+            queue.get_nowait()
+        payload = {"op": "reload"}
+    queue.put_nowait(payload)
+
+
+broker = Broker()
+
+
+# ─────────────────────────── публикация ───────────────────────────
+def _encode(user_id: int, payload: dict) -> str:
+    data = json.dumps({"user_id": user_id, **payload}, ensure_ascii=False, default=str)
+    if len(data.encode()) > MAX_PAYLOAD:
+        data = json.dumps({"user_id": user_id, "op": "reload"})
+    return data
+
+
+def publish(db: Session, user_id: int, payload: dict) -> None:
+    """Вызывать до commit: событие уйдёт только если запись зафиксирована"""
+    data = _encode(user_id, payload)
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": data})
+    else:
+        db.info.setdefault("pending_events", []).append(data)
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_pending(session: Session) -> None:
+    for data in session.info.pop("pending_events", []):
+        _deliver(data)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session: Session) -> None:
+    session.info.pop("pending_events", None)
+
+
+def _deliver(data: str) -> None:
+    payload = json.loads(data)
+    broker.dispatch(payload.pop("user_id"), payload)
+
+
+# ─────────────────── LISTEN для PostgreSQL (между воркерами) ───────────────────
+class Listener(threading.Thread):
+    def __init__(self):
+        super().__init__(name="tx-events-listener", daemon=True)
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self._listen()
+            except Exception:
+                logger.exception("LISTEN %s: соединение потеряно, переподключение", CHANNEL)
+                self._stopped.wait(5)
+
+    def _listen(self) -> None:
+        raw = engine.raw_connection()
+        try:
+            conn = raw.driver_connection
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {CHANNEL}")
+            while not self._stopped.is_set():
+                if select.select([conn], [], [], 1.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    _deliver(conn.notifies.pop(0).payload)
+        finally:
+            raw.invalidate()    # autocommit/LISTEN – в пул соединение не возвращаем
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+_listener: Optional[Listener] = None
+
+
+def start_listener() -> None:
+    global _listener
+    if engine.dialect.name != "postgresql" or _listener is not None:
+        return
+    _listener = Listener()
+    _listener.start()
+
+
+def stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,173 @@
+# app/services/export.py
+"""
+Потоковые выгрузки для /reports: CSV и Apache Arrow (IPC stream) / Parquet.
+
+Строки читаются серверным курсором (yield_per) пачками по EXPORT_BATCH_SIZE,
+каждая пачка сразу кодируется и отдаётся клиенту – память не зависит от объёма выборки.
+"""
+import csv
+import io
+from itertools import islice
+from typing import Iterator
+
+from app.core.config import settings
+from app.db.models.transaction import Transaction as Tx, PersonType, TransactionStatus, TransactionType
+
+# (имя колонки в выгрузке, колонка модели)
+EXPORT_COLUMNS = [
+    ("id", Tx.id),
+    ("date_time", Tx.date_time),
+    ("person_type", Tx.person_type),
+    ("transaction_type", Tx.transaction_type),
+    ("status", Tx.status),
+    ("amount", Tx.amount),
+    ("category", Tx.category),
+    ("sender_bank", Tx.sender_bank),
+    ("sender_account", Tx.sender_account),
+    ("recipient_bank", Tx.recipient_bank),
+    ("recipient_inn", Tx.recipient_inn),
+    ("recipient_account", Tx.recipient_account),
+    ("recipient_phone", Tx.recipient_phone),
+    ("comment", Tx.comment),
+]
+
+# Колонки-перечисления: кодируются словарём с фиксированным набором значений,
+# поэтому словарь одинаков во всех пачках
+ENUM_COLUMNS = {
+    "person_type": PersonType,
+    "transaction_type": TransactionType,
+    "status": TransactionStatus,
+}
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def export_entities():
+    return [col for _, col in EXPORT_COLUMNS]
+
+
+def iter_batches(q) -> Iterator[list]:
+    """Пачки строк через серверный курсор (для PostgreSQL – named cursor)"""
+    rows = iter(q.order_by(Tx.date_time, Tx.id).yield_per(settings.EXPORT_BATCH_SIZE))
+    while True:
+        batch = list(islice(rows, settings.EXPORT_BATCH_SIZE))
+        if not batch:
+            return
+        yield batch
+
+
+# ─────────────────────────── CSV ───────────────────────────
+def _csv_value(value):
+    if value is None:
+        return ""
+    if hasattr(value, "value"):         # enum -> подпись
+        return value.value
+    if hasattr(value, "isoformat"):
+        return value.isoformat(sep=" ")
+    return value
+
+
+def csv_stream(q) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow([name for name, _ in EXPORT_COLUMNS])
+    for batch in iter_batches(q):
+        writer.writerows([_csv_value(v) for v in row] for row in batch)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+# ─────────────────────── Arrow / Parquet ───────────────────────
+class _ChunkSink(io.RawIOBase):
+    """Файлоподобный приёмник: писатель Arrow/Parquet пишет сюда, мы забираем байты после каждой пачки"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def arrow_schema(pa):
+    fields = []
+    for name, _ in EXPORT_COLUMNS:
+        if name == "id":
+            fields.append(pa.field(name, pa.int64(), nullable=False))
+        elif name == "date_time":
+            fields.append(pa.field(name, pa.timestamp("s")))
+        elif name == "amount":
+            fields.append(pa.field(name, pa.float64(), nullable=False))
+        elif name in ENUM_COLUMNS:
+            fields.append(pa.field(name, pa.dictionary(pa.int8(), pa.string())))
+        else:
+            fields.append(pa.field(name, pa.string()))
+    return pa.schema(fields)
+
+
+def _record_batch(pa, schema, batch):
+    columns = list(zip(*batch))
+    arrays = []
+    for (name, _), values in zip(EXPORT_COLUMNS, columns):
+        enum = ENUM_COLUMNS.get(name)
+        if enum is not None:
+            members = list(enum)
+            codes = {m: i for i, m in enumerate(members)}
+            arrays.append(pa.DictionaryArray.from_arrays(
+                pa.array([None if v is None else codes[v] for v in values], type=pa.int8()),
+                pa.array([m.value for m in members], type=pa.string()),
+            ))
+        else:
+            arrays.append(pa.array(values, type=schema.field(name).type))
+    return pa.record_batch(arrays, schema=schema)
+
+
+def arrow_stream(q, fmt: str) -> Iterator[bytes]:
+    """fmt = 'arrow' (IPC stream) или 'parquet' (одна row group на пачку)"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema(pa)
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+        write = writer.write_batch
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+        write = writer.write_batch
+
+    for batch in iter_batches(q):
+        write(_record_batch(pa, schema, batch))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def pyarrow_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
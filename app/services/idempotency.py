@@ -0,0 +1,147 @@
+# app/services/idempotency.py
+"""
+Идемпотентные создания транзакций по заголовку Idempotency-Key.
+
+Ключ с ответом сохраняется в той же транзакции БД, что и сама запись
+(сервисный слой вызывает `remember` перед commit). Поэтому:
+* повтор после успешного ответа находит ключ и получает сохранённый ответ;
+* повтор, пришедший, пока первый запрос ещё выполняется, ждёт на блокировке
+  пользователя (touch_user_data), затем сервисный слой проверяет ключ ещё раз
+  (`recheck`) – до поиска дубликатов, поэтому повтор получает сохранённый ответ,
+  а не 409 «Duplicate»; уникальный индекс (user_id, key) остаётся страховкой
+  (IntegrityError -> откат и сохранённый ответ);
+* если первый запрос упал, ключ не сохранён и повтор выполняется заново.
+Тот же ключ с другим телом запроса – 422. Ключи живут IDEMPOTENCY_TTL_HOURS.
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Any, Callable, NamedTuple, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models.idempotency import IdempotencyKey
+
+REPLAY_HEADER = "Idempotent-Replayed"
+
+
+class AlreadyStored(Exception):
+    """Ключ сохранён параллельным запросом, пока этот ждал блокировку пользователя"""
+
+    def __init__(self, record: IdempotencyKey):
+        super().__init__(record.key)
+        self.record = record
+
+
+class Idempotent(NamedTuple):
+    key: str
+    request_hash: str
+    status_code: int
+    render: Callable[[Any], Any]    # результат сервиса -> тело ответа
+
+
+def request_hash(route: str, params: dict, body: Any) -> str:
+    raw = json.dumps({"route": route, "params": params, "body": jsonable_encoder(body)}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def lookup(db: Session, user_id: int, key: str, req_hash: str) -> Optional[IdempotencyKey]:
+    """Действующий ключ пользователя; просроченный удаляется (в текущей транзакции БД)"""
+    record = (
+        db.query(IdempotencyKey)
+        .filter(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        .first()
+    )
+    if record is None:
+        return None
+    if record.expires_at <= datetime.utcnow():
+        db.delete(record)
+        db.flush()
+        return None
+    if record.request_hash != req_hash:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+    return record
+
+
+def recheck(db: Session, user_id: int, idempotent: Optional[Idempotent]) -> None:
+    """
+    Повторная проверка ключа под блокировкой пользователя – вызывать сразу после
+    touch_user_data. Если параллельный запрос с тем же ключом уже закоммитил запись,
+    бросает AlreadyStored (run отвечает сохранённым ответом).
+    """
+    if idempotent is None:
+        return
+    record = lookup(db, user_id, idempotent.key, idempotent.request_hash)
+    if record is not None:
+        raise AlreadyStored(record)
+
+
+def remember(db: Session, user_id: int, idempotent: Idempotent, result: Any) -> None:
+    """Сохраняет ответ для ключа. Вызывать до commit записи."""
+    body = json.dumps(jsonable_encoder(idempotent.render(result)), ensure_ascii=False)
+    now = datetime.utcnow()
+    db.add(IdempotencyKey(
+        user_id=user_id,
+        key=idempotent.key,
+        request_hash=idempotent.request_hash,
+        status_code=idempotent.status_code,
+        response=body,
+        response_hash=hashlib.sha256(body.encode()).hexdigest(),
+        created_at=now,
+        expires_at=now + timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS),
+    ))
+
+
+def replay(record: IdempotencyKey) -> JSONResponse:
+    return JSONResponse(
+        status_code=record.status_code,
+        content=json.loads(record.response),
+        headers={REPLAY_HEADER: "true", "ETag": f'"{record.response_hash}"'},
+    )
+
+
+def run(db: Session, user_id: int, key: Optional[str], req_hash: str, status_code: int,
+        render: Callable[[Any], Any], write: Callable[[Optional[Idempotent]], Any]):
+    """
+    Выполняет `write(idempotent)` или отвечает сохранённым ответом.
+    Без ключа – обычная запись.
+    """
+    if not key:
+        return write(None)
+    record = lookup(db, user_id, key, req_hash)
+    if record is not None:
+        return replay(record)
+    try:
+        return write(Idempotent(key, req_hash, status_code, render))
+    except AlreadyStored as exc:
+        response = replay(exc.record)
+        db.rollback()
+        return response
+    except IntegrityError:
+        # параллельный запрос с тем же ключом успел закоммитить первым
+        db.rollback()
+        record = lookup(db, user_id, key, req_hash)
+        if record is None:
+            raise
+        return replay(record)
+
+
+def purge_expired(db: Session, batch_size: int = 10000) -> int:
+    """Удаляет просроченные ключи пачками по индексу expires_at; возвращает число удалённых"""
+    total = 0
+    while True:
+        ids = [
+            row_id for (row_id,) in db.query(IdempotencyKey.id)
+            .filter(IdempotencyKey.expires_at <= datetime.utcnow())
+            .limit(batch_size)
+        ]
+        if not ids:
+            return total
+        db.query(IdempotencyKey).filter(IdempotencyKey.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        total += len(ids)
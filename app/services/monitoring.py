@@ -0,0 +1,198 @@
+# app/services/monitoring.py
+"""
+Потоковый мониторинг транзакций.
+
+Правила проверяются в момент создания / импорта транзакции, а не отчётными
+запросами задним числом: сервисный слой вызывает process() в той же транзакции
+БД, что и запись, до commit. Запись держит блокировку строки users
+(touch_user_data), поэтому записи одного пользователя – в том числе из разных
+воркеров – проверяются строго по очереди и видят друг друга.
+
+Состояние окон не хранится в памяти процесса (с несколькими воркерами счётчики
+расходились бы): на каждую пачку оно поднимается из БД одним-двумя индексными
+запросами, ограниченными ИНН пачки и двумя длинами окна, и держится в
+отсортированных списках меток – проверка события O(log n) по размеру окна.
+Окна считаются по date_time, но события старше окна относительно текущего
+момента (импорт выписки задним числом) в скорость и всплески не входят.
+Сработавшие правила сохраняются в таблицу alerts (см. /alerts).
+"""
+import logging
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models.alert import Alert
+from app.db.models.transaction import Transaction, TransactionStatus
+
+logger = logging.getLogger(__name__)
+
+BURST_STATUSES = (TransactionStatus.canceled, TransactionStatus.refund)
+
+
+class UserWindow:
+    """Окна одного пользователя для проверки одной пачки"""
+    __slots__ = ("now", "by_inn", "known_inns", "status_burst")
+
+    def __init__(self, now: datetime, by_inn: Dict[str, List[datetime]], known_inns: Set[str],
+                 status_burst: List[datetime]):
+        self.now = now
+        self.by_inn = by_inn
+        self.known_inns = known_inns
+        self.status_burst = status_burst
+
+
+def _slide(times: List[datetime], ts: Optional[datetime], window: timedelta, now: datetime) -> int:
+    """
+    Добавляет событие в отсортированный список меток и возвращает число событий
+    в окне [ts - window, ts]. Событие без даты или старше окна относительно `now`
+    (загружено задним числом) не учитывается – возвращается 0.
+    """
+    if ts is None or ts < now - window:
+        return 0
+    insort(times, ts)
+    return bisect_right(times, ts) - bisect_left(times, ts - window)
+
+
+# ─────────────────────────── правила ───────────────────────────
+class Rule(ABC):
+    name = ""
+
+    @abstractmethod
+    def check(self, state: UserWindow, tx: Transaction) -> Optional[str]:
+        """Текст алерта или None"""
+
+
+class AmountThresholdRule(Rule):
+    name = "amount"
+
+    def check(self, state, tx):
+        if tx.amount >= settings.MONITOR_AMOUNT_THRESHOLD:
+            return f"Сумма {tx.amount:.2f} превышает порог {settings.MONITOR_AMOUNT_THRESHOLD:.2f}"
+        return None
+
+
+class VelocityRule(Rule):
+    name = "velocity"
+
+    def check(self, state, tx):
+        window = timedelta(minutes=settings.MONITOR_VELOCITY_WINDOW_MINUTES)
+        count = _slide(state.by_inn.setdefault(tx.recipient_inn, []), tx.date_time, window, state.now)
+        if count > settings.MONITOR_VELOCITY_MAX:
+            return (f"Более {settings.MONITOR_VELOCITY_MAX} операций с ИНН {tx.recipient_inn} "
+                    f"за {settings.MONITOR_VELOCITY_WINDOW_MINUTES} мин.")
+        return None
+
+
+class NewCounterpartyRule(Rule):
+    name = "new_counterparty"
+
+    def check(self, state, tx):
+        if tx.recipient_inn in state.known_inns:
+            return None
+        state.known_inns.add(tx.recipient_inn)
+        return f"Новый контрагент: ИНН {tx.recipient_inn}"
+
+
+class StatusBurstRule(Rule):
+    name = "status_burst"
+
+    def check(self, state, tx):
+        if tx.status not in BURST_STATUSES:
+            return None
+        window = timedelta(minutes=settings.MONITOR_BURST_WINDOW_MINUTES)
+        count = _slide(state.status_burst, tx.date_time, window, state.now)
+        if count > settings.MONITOR_BURST_MAX:
+            return (f"Всплеск отмен/возвратов: более {settings.MONITOR_BURST_MAX} "
+                    f"за {settings.MONITOR_BURST_WINDOW_MINUTES} мин.")
+        return None
+
+
+RULES = {rule.name: rule for rule in (
+    AmountThresholdRule(), VelocityRule(), NewCounterpartyRule(), StatusBurstRule(),
+)}
+
+
+def active_rules() -> List[Rule]:
+    names = [n.strip() for n in settings.MONITOR_RULES.split(",") if n.strip()]
+    return [RULES[n] for n in names if n in RULES]
+
+
+# ─────────────────────── состояние из БД ───────────────────────
+def _load_window(db: Session, user_id: int, transactions: List[Transaction], rules: List[Rule]) -> UserWindow:
+    """
+    Состояние окон на момент перед пачкой: уже сохранённые транзакции пользователя
+    (без строк самой пачки). Запросы идут по индексу counterparty_id и только для
+    включённых правил. Окно события [ts - окно, ts] при ts >= now - окно целиком
+    лежит в последних двух окнах – старше читать не нужно.
+    """
+    now = datetime.utcnow()
+    batch_ids = [tx.id for tx in transactions]
+    names = {rule.name for rule in rules}
+    cp_ids = list({tx.counterparty_id for tx in transactions if tx.counterparty_id is not None})
+    by_inn: Dict[str, List[datetime]] = {}
+    known: Set[str] = set()
+
+    if cp_ids and names & {"velocity", "new_counterparty"}:
+        since = now - 2 * timedelta(minutes=settings.MONITOR_VELOCITY_WINDOW_MINUTES)
+        rows = (
+            db.query(Transaction.recipient_inn, Transaction.date_time)
+            .filter(
+                Transaction.user_id == user_id,
+                Transaction.counterparty_id.in_(cp_ids),
+                Transaction.id.notin_(batch_ids),
+            )
+        )
+        if "new_counterparty" in names:
+            known = {inn for (inn,) in rows.with_entities(Transaction.recipient_inn).distinct()}
+        if "velocity" in names:
+            for inn, ts in rows.filter(Transaction.date_time >= since).order_by(Transaction.date_time):
+                by_inn.setdefault(inn, []).append(ts)
+
+    burst: List[datetime] = []
+    if "status_burst" in names and any(tx.status in BURST_STATUSES for tx in transactions):
+        since = now - 2 * timedelta(minutes=settings.MONITOR_BURST_WINDOW_MINUTES)
+        burst = [
+            ts for (ts,) in db.query(Transaction.date_time)
+            .filter(
+                Transaction.user_id == user_id,
+                Transaction.status.in_(BURST_STATUSES),
+                Transaction.date_time >= since,
+                Transaction.id.notin_(batch_ids),
+            )
+            .order_by(Transaction.date_time)
+        ]
+    return UserWindow(now, by_inn, known, burst)
+
+
+def process(db: Session, user_id: int, transactions: List[Transaction]) -> List[Alert]:
+    """
+    Прогоняет только что записанные (flush) транзакции через активные правила
+    и добавляет сработавшие алерты в сессию. Вызывается сервисным слоем после
+    touch_user_data и до commit – алерты фиксируются вместе с записью.
+    Ошибка проверки не роняет запись: откатывается только точка сохранения
+    мониторинга, ошибка пишется в лог.
+    """
+    rules = active_rules()
+    if not rules or not transactions:
+        return []
+
+    alerts = []
+    savepoint = db.begin_nested()
+    try:
+        state = _load_window(db, user_id, transactions, rules)
+        for tx in sorted(transactions, key=lambda t: (t.date_time is None, t.date_time or state.now, t.id)):
+            for rule in rules:
+                message = rule.check(state, tx)
+                if message:
+                    alerts.append(Alert(user_id=user_id, transaction_id=tx.id, rule=rule.name, message=message))
+        db.add_all(alerts)
+        savepoint.commit()
+    except Exception:
+        savepoint.rollback()
+        logger.exception("monitoring: проверка правил для пользователя %s не удалась", user_id)
+        return []
+    return alerts
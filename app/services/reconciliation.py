@@ -0,0 +1,255 @@
+# app/services/reconciliation.py
+"""
+Сверка банковской выписки с сохранёнными транзакциями.
+
+Обе стороны читаются целиком: выписка – из CSV, транзакции – одним запросом
+по диапазону дат выписки (± допуск). Дальше хэш-соединение по ключу
+(сумма в копейках, ИНН получателя) и внутри каждой корзины – слияние двух
+отсортированных по дате списков с окном допуска. Запросов на строку нет,
+поэтому выписки на 100k строк сверяются за секунды.
+
+Списание и поступление на одну сумму не сопоставляются. Направление строки берётся
+из колонки типа операции, а если её нет – из знака суммы, когда в выписке есть
+отрицательные суммы (минус – списание). В выписке без колонки типа и без минусов
+направление неизвестно, и строка сопоставляется с транзакцией любого типа.
+"""
+import csv
+import io
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.db.models.transaction import Transaction, TransactionType
+
+# Допустимые заголовки колонок выписки -> поле строки
+HEADER_ALIASES = {
+    "date_time": "date_time", "date": "date_time", "дата": "date_time",
+    "amount": "amount", "sum": "amount", "сумма": "amount",
+    "recipient_inn": "recipient_inn", "inn": "recipient_inn", "инн": "recipient_inn",
+    "sender_account": "sender_account", "счет отправителя": "sender_account",
+    "recipient_account": "recipient_account", "счет получателя": "recipient_account",
+    "reference": "reference", "id": "reference", "номер": "reference",
+    "transaction_type": "transaction_type", "type": "transaction_type", "тип": "transaction_type",
+}
+# Направление операции: -1 списание, 1 поступление, 0 – неизвестно
+DIRECTIONS = {
+    "списание": -1, "расход": -1, "expense": -1, "debit": -1, "дебет": -1,
+    "поступление": 1, "приход": 1, "income": 1, "credit": 1, "кредит": 1,
+}
+REQUIRED = ("date_time", "amount", "recipient_inn")
+DATE_FORMATS = ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%d.%m.%Y %H:%M:%S", "%d.%m.%Y")
+
+
+class StatementLine(NamedTuple):
+    line: int                       # номер строки в файле (для отчёта)
+    date_time: datetime
+    kopecks: int
+    recipient_inn: str
+    sender_account: Optional[str]
+    recipient_account: Optional[str]
+    reference: Optional[str]
+    direction: int = 0
+
+
+class StoredTx(NamedTuple):
+    id: int
+    date_time: datetime
+    kopecks: int
+    recipient_inn: str
+    sender_account: Optional[str]
+    recipient_account: Optional[str]
+    status: object
+    direction: int = 0
+
+
+# ─────────────────────────── разбор выписки ───────────────────────────
+def _norm(value: Optional[str]) -> Optional[str]:
+    value = (value or "").strip().replace(" ", "")
+    return value or None
+
+
+def _parse_date(value: str) -> datetime:
+    """Наивная дата в UTC, как date_time транзакций; дата со смещением приводится к UTC"""
+    value = value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _kopecks(amount) -> int:
+    if isinstance(amount, str):
+        amount = amount.strip().replace("\xa0", "").replace(" ", "").replace(",", ".")
+    return round(float(amount) * 100)
+
+
+def _direction(value: Optional[str]) -> int:
+    value = (value or "").strip().lower()
+    if not value:
+        return 0
+    if value not in DIRECTIONS:
+        raise ValueError(value)
+    return DIRECTIONS[value]
+
+
+def parse_statement(raw: bytes) -> List[StatementLine]:
+    """CSV (разделитель , или ;, UTF-8 или cp1251) -> строки выписки. Ошибки формата – 422."""
+    try:
+        text = raw.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        text = raw.decode("cp1251")
+    sample = text[:4096]
+    delimiter = ";" if sample.count(";") > sample.count(",") else ","
+    reader = csv.reader(io.StringIO(text), delimiter=delimiter)
+
+    header = next(reader, None)
+    if not header:
+        raise HTTPException(status_code=422, detail="Empty statement")
+    columns = {HEADER_ALIASES[h.strip().lower()]: i for i, h in enumerate(header) if h.strip().lower() in HEADER_ALIASES}
+    missing = [name for name in REQUIRED if name not in columns]
+    if missing:
+        raise HTTPException(status_code=422, detail={"message": "Missing columns", "columns": missing})
+
+    def cell(row, name):
+        i = columns.get(name)
+        return row[i] if i is not None and i < len(row) else None
+
+    lines = []
+    for number, row in enumerate(reader, start=2):
+        if not any(c.strip() for c in row):
+            continue
+        empty = [name for name in REQUIRED if not (cell(row, name) or "").strip()]
+        if empty:
+            raise HTTPException(
+                status_code=422,
+                detail={"message": "Missing required values", "line": number, "columns": empty},
+            )
+        try:
+            lines.append(StatementLine(
+                number,
+                _parse_date(cell(row, "date_time")),
+                _kopecks(cell(row, "amount")),
+                _norm(cell(row, "recipient_inn")),
+                _norm(cell(row, "sender_account")),
+                _norm(cell(row, "recipient_account")),
+                (cell(row, "reference") or "").strip() or None,
+                _direction(cell(row, "transaction_type")),
+            ))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=422, detail={"message": "Invalid statement line", "line": number})
+
+    # без колонки типа направление задаёт знак суммы – если выписка вообще со знаками
+    signed = "transaction_type" not in columns and any(line.kopecks < 0 for line in lines)
+    return [
+        line._replace(
+            kopecks=abs(line.kopecks),
+            direction=line.direction or ((-1 if line.kopecks < 0 else 1) if signed else 0),
+        )
+        for line in lines
+    ]
+
+
+# ─────────────────────────── сопоставление ───────────────────────────
+def _load_stored(db: Session, user_id: int, start: datetime, end: datetime) -> List[StoredTx]:
+    rows = (
+        db.query(
+            Transaction.id, Transaction.date_time, Transaction.amount, Transaction.recipient_inn,
+            Transaction.sender_account, Transaction.recipient_account, Transaction.status,
+            Transaction.transaction_type,
+        )
+        .filter(Transaction.user_id == user_id, Transaction.date_time >= start, Transaction.date_time <= end)
+        .execution_options(yield_per=10000)
+    )
+    return [
+        StoredTx(tx_id, dt, abs(_kopecks(amount)), _norm(inn) or "", _norm(sender), _norm(recipient), status,
+                 -1 if tx_type == TransactionType.expense else 1)
+        for tx_id, dt, amount, inn, sender, recipient, status, tx_type in rows
+    ]
+
+
+def _accounts_match(line: StatementLine, tx: StoredTx) -> bool:
+    """Направление – если известно у строки выписки; счета – только если указаны с обеих сторон"""
+    if line.direction and line.direction != tx.direction:
+        return False
+    for a, b in ((line.sender_account, tx.sender_account), (line.recipient_account, tx.recipient_account)):
+        if a and b and a != b:
+            return False
+    return True
+
+
+def _merge(lines: List[StatementLine], stored: List[StoredTx], tolerance: timedelta):
+    """
+    Слияние двух отсортированных по дате списков одной корзины.
+    Для строки выписки берётся самая ранняя свободная транзакция в окне
+    [дата - допуск, дата + допуск] с совпадающими направлением и счетами.
+    """
+    matched, missing = [], []
+    used = [False] * len(stored)
+    start = 0
+    for line in lines:
+        low, high = line.date_time - tolerance, line.date_time + tolerance
+        while start < len(stored) and (used[start] or stored[start].date_time < low):
+            start += 1
+        pick = None
+        k = start
+        while k < len(stored) and stored[k].date_time <= high:
+            if not used[k] and _accounts_match(line, stored[k]):
+                pick = k
+                break
+            k += 1
+        if pick is None:
+            missing.append(line)
+        else:
+            used[pick] = True
+            matched.append((line, stored[pick]))
+    extra = [tx for tx, u in zip(stored, used) if not u]
+    return matched, missing, extra
+
+
+def reconcile(db: Session, user_id: int, lines: Iterable[StatementLine], date_tolerance_days: int = 2) -> dict:
+    """
+    matched – пары (строка выписки, транзакция), missing – строки выписки без транзакции,
+    extra – транзакции в периоде выписки, которых нет в выписке.
+    """
+    lines = sorted(lines, key=lambda l: l.date_time)
+    result = {"period_from": None, "period_to": None, "matched": [], "missing": [], "extra": []}
+    if not lines:
+        return result
+
+    tolerance = timedelta(days=date_tolerance_days)
+    period_from, period_to = lines[0].date_time, lines[-1].date_time
+    stored = sorted(_load_stored(db, user_id, period_from - tolerance, period_to + tolerance),
+                    key=lambda t: (t.date_time, t.id))
+
+    buckets: Dict[Tuple[int, str], Tuple[list, list]] = defaultdict(lambda: ([], []))
+    for line in lines:
+        buckets[(line.kopecks, line.recipient_inn)][0].append(line)
+    for tx in stored:
+        buckets[(tx.kopecks, tx.recipient_inn)][1].append(tx)
+
+    matched, missing, extra = [], [], []
+    for bucket_lines, bucket_stored in buckets.values():
+        m, miss, ext = _merge(bucket_lines, bucket_stored, tolerance)
+        matched.extend(m)
+        missing.extend(miss)
+        extra.extend(ext)
+
+    # транзакции из полос допуска за краями выписки лишними не считаются
+    day_from = period_from.replace(hour=0, minute=0, second=0, microsecond=0)
+    day_to = period_to.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    result.update(
+        period_from=period_from,
+        period_to=period_to,
+        matched=sorted(matched, key=lambda p: p[0].line),
+        missing=sorted(missing, key=lambda l: l.line),
+        extra=sorted((tx for tx in extra if day_from <= tx.date_time < day_to), key=lambda t: (t.date_time, t.id)),
+    )
+    return result
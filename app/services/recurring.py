@@ -0,0 +1,98 @@
+# app/services/recurring.py
+"""
+Поиск регулярных платежей: тот же ИНН и тип, похожая сумма, равномерный интервал.
+История пользователя читается одним запросом, отсортированным по (ИНН, тип, дата),
+после чего серии находятся за один линейный проход без дополнительных запросов.
+"""
+from datetime import datetime, timedelta
+from itertools import groupby
+from statistics import median
+from typing import List
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models.transaction import RecurringPayment, Transaction, TransactionStatus
+
+# Отменённые / удалённые платежи регулярность не подтверждают
+_IGNORED_STATUSES = (TransactionStatus.canceled, TransactionStatus.deleted)
+
+
+def _close(base: float, value: float, tolerance: float) -> bool:
+    return abs(value - base) <= abs(base) * tolerance
+
+
+def _find_series(points: list) -> list:
+    """
+    points – [(date_time, amount)] одного контрагента по возрастанию даты.
+    Жадно режем на серии, в которых сумма близка к первой сумме серии, а интервал –
+    к первому интервалу. Возвращает последнюю (самую свежую) подходящую серию.
+    """
+    best, run = [], []
+    for point in points:
+        if not run:
+            run = [point]
+            continue
+        interval = (point[0] - run[-1][0]).total_seconds() / 86400
+        ok_amount = _close(run[0][1], point[1], settings.RECURRING_AMOUNT_TOLERANCE)
+        if len(run) == 1:
+            ok_interval = interval >= 1
+        else:
+            first_interval = (run[1][0] - run[0][0]).total_seconds() / 86400
+            ok_interval = _close(first_interval, interval, settings.RECURRING_INTERVAL_TOLERANCE)
+        if ok_amount and ok_interval:
+            run.append(point)
+        else:
+            if len(run) >= settings.RECURRING_MIN_OCCURRENCES:
+                best = run
+            run = [run[-1], point] if ok_amount and interval >= 1 else [point]
+    if len(run) >= settings.RECURRING_MIN_OCCURRENCES:
+        best = run
+    return best
+
+
+def detect_recurring(rows) -> List[RecurringPayment]:
+    """rows – (recipient_inn, transaction_type, date_time, amount), отсортированные по первым трём полям"""
+    found = []
+    for (inn, tx_type), group in groupby(rows, key=lambda r: (r[0], r[1])):
+        series = _find_series([(r[2], r[3]) for r in group])
+        if not series:
+            continue
+        intervals = [(b[0] - a[0]).total_seconds() / 86400 for a, b in zip(series, series[1:])]
+        interval = median(intervals)
+        found.append(RecurringPayment(
+            recipient_inn=inn,
+            transaction_type=tx_type,
+            occurrences=len(series),
+            avg_amount=round(sum(p[1] for p in series) / len(series), 2),
+            interval_days=round(interval, 2),
+            first_date=series[0][0],
+            last_date=series[-1][0],
+            next_expected=series[-1][0] + timedelta(days=interval),
+        ))
+    return found
+
+
+def refresh_user(db: Session, user_id: int) -> List[RecurringPayment]:
+    """Пересчитывает регулярные платежи пользователя (полная замена его строк)"""
+    rows = (
+        db.query(Transaction.recipient_inn, Transaction.transaction_type, Transaction.date_time, Transaction.amount)
+        .filter(
+            Transaction.user_id == user_id,
+            Transaction.duplicate_of_id.is_(None),
+            Transaction.status.notin_(_IGNORED_STATUSES),
+            Transaction.date_time.isnot(None),
+        )
+        .order_by(Transaction.recipient_inn, Transaction.transaction_type, Transaction.date_time)
+        .yield_per(5000)
+    )
+    found = detect_recurring(rows)
+
+    now = datetime.utcnow()
+    db.query(RecurringPayment).filter(RecurringPayment.user_id == user_id).delete(synchronize_session=False)
+    for item in found:
+        item.user_id = user_id
+        item.detected_at = now
+    db.add_all(found)
+    db.commit()
+    return found
@@ -0,0 +1,91 @@
+# app/services/reports.py
+"""
+Отрисовка отчётов PDF / Excel. Общая для /reports и пакетной генерации
+выписок (app/jobs/statements.py).
+"""
+from io import BytesIO
+from pathlib import Path
+
+import pandas as pd
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.pdfgen import canvas
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+# Путь к TTF‑шрифту (поддерживает кириллицу)
+FONT_PATH = Path(__file__).parent.parent / "static" / "fonts" / "DejaVuSans.ttf"
+FONT_NAME = "DejaVuSans"
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def register_font() -> None:
+    """Регистрирует шрифт (один раз за процесс); FileNotFoundError, если файла нет"""
+    if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        if not FONT_PATH.exists():
+            raise FileNotFoundError("Шрифт DejaVuSans.ttf не найден")
+        pdfmetrics.registerFont(TTFont(FONT_NAME, str(FONT_PATH)))
+
+
+def build_dataframe(data) -> pd.DataFrame:
+    return pd.DataFrame([{
+        "ID": t.id,
+        "Дата / время": t.date_time.strftime("%d.%m.%Y %H:%M"),
+        "Тип": t.transaction_type.value,
+        "Категория": t.category or "",
+        "Сумма": f"{t.amount:.2f}",
+        "Статус": t.status.value,
+        "Банк получателя": t.recipient_bank or "",
+        "ИНН получателя": t.recipient_inn
+    } for t in data])
+
+
+def render_xlsx(df: pd.DataFrame) -> BytesIO:
+    buf = BytesIO()
+    with pd.ExcelWriter(buf, engine="xlsxwriter") as writer:
+        df.to_excel(writer, index=False, sheet_name="Report")
+    buf.seek(0)
+    return buf
+
+
+def render_pdf(df: pd.DataFrame) -> BytesIO:
+    register_font()
+
+    buf = BytesIO()
+    pdf = canvas.Canvas(buf, pagesize=landscape(A4))
+    pdf.setFont(FONT_NAME, 9)
+
+    # вычисляем ширину колонок
+    cols = list(df.columns)
+    col_w = []
+    for col in cols:
+        max_len = max(len(str(x)) for x in df[col].tolist() + [col])
+        # 6 px ≈ средняя ширина символа шрифтом 9 pt
+        col_w.append(max(60, min(140, max_len * 6)))
+
+    x0, y0 = 40, A4[0] - 40
+    row_h  = 14
+
+    # --- заголовок таблицы ---
+    x = x0
+    for w, name in zip(col_w, cols):
+        pdf.drawString(x, y0, name)
+        x += w
+    pdf.line(x0, y0 - 2, x0 + sum(col_w), y0 - 2)
+
+    # --- строки ---
+    y = y0
+    for row in df.itertuples(index=False):
+        y -= row_h
+        if y < 40:                       # новая страница
+            pdf.showPage()
+            pdf.setFont(FONT_NAME, 9)
+            y = y0
+        x = x0
+        for w, val in zip(col_w, row):
+            pdf.drawString(x, y, str(val))
+            x += w
+
+    pdf.save()
+    buf.seek(0)
+    return buf
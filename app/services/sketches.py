@@ -0,0 +1,219 @@
+# app/services/sketches.py
+"""
+Помесячные скетчи распределения сумм (monthly_sketches) и статистика по ним.
+
+Запись транзакций помечает затронутые месяцы пользователя stale (в той же
+транзакции БД). При чтении недостающие месяцы создаются, а устаревшие
+пересобираются одним запросом по диапазону дат; статистика за период –
+слияние скетчей месяцев, сырые суммы не сортируются.
+Сборка – запись, поэтому она идёт в своей сессии основной БД, а не в сессии
+read-only запроса (которая может смотреть на реплику).
+"""
+import json
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.db.models.sketch import MonthlySketch
+from app.db.models.transaction import Transaction, TransactionType
+from app.db.session import SessionLocal
+from app.services.tx_state import TxState
+from app.utils.sketches import Histogram, HyperLogLog, TDigest
+
+QUANTILES = {"p50": 0.5, "p90": 0.9, "p99": 0.99}
+
+
+def month_start(dt: datetime) -> datetime:
+    return dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(month: datetime) -> datetime:
+    return month.replace(year=month.year + 1, month=1) if month.month == 12 else month.replace(month=month.month + 1)
+
+
+def months_between(first: datetime, last: datetime) -> List[datetime]:
+    months, month = [], month_start(first)
+    while month <= last:
+        months.append(month)
+        month = next_month(month)
+    return months
+
+
+# ─────────────────────────── запись ───────────────────────────
+def invalidate(db: Session, user_id: int, states: Iterable[TxState]) -> None:
+    """Помечает stale месяцы затронутых транзакций. Вызывать до commit."""
+    months = {month_start(s.date_time) for s in states if s.date_time}
+    if not months:
+        return
+    db.query(MonthlySketch).filter(
+        MonthlySketch.user_id == user_id, MonthlySketch.month.in_(months)
+    ).update({MonthlySketch.stale: True}, synchronize_session=False)
+
+
+# ─────────────────────────── чтение ───────────────────────────
+def _rebuild(db: Session, user_id: int, rows: List[MonthlySketch]) -> None:
+    """Пересобирает скетчи месяцев одним запросом по диапазону [первый месяц, последний + 1)"""
+    targets = {(row.month, row.transaction_type): row for row in rows}
+    parts = defaultdict(lambda: (TDigest(), HyperLogLog(), Histogram()))
+    first = min(row.month for row in rows)
+    end = next_month(max(row.month for row in rows))
+    q = (
+        db.query(Transaction.date_time, Transaction.transaction_type, Transaction.amount, Transaction.recipient_inn)
+        .filter(
+            Transaction.user_id == user_id,
+            Transaction.duplicate_of_id.is_(None),
+            Transaction.date_time >= first,
+            Transaction.date_time < end,
+        )
+        .execution_options(yield_per=10000)
+    )
+    for dt, tx_type, amount, inn in q:
+        key = (month_start(dt), tx_type)
+        if key not in targets:
+            continue
+        digest, hll, histogram = parts[key]
+        digest.add(amount)
+        hll.add(inn)
+        histogram.add(amount)
+
+    now = datetime.utcnow()
+    for key, row in targets.items():
+        digest, hll, histogram = parts[key]
+        row.tx_count = int(digest.count)
+        row.digest = json.dumps(digest.to_dict())
+        row.hll = hll.to_bytes()
+        row.histogram = json.dumps(histogram.counts)
+        row.stale = False
+        row.built_at = now
+
+
+def _create_missing(db: Session, user_id: int, months: List[datetime], attempts: int = 3) -> None:
+    """
+    Заготовки недостающих месяцев коммитятся сразу: запись транзакции в этот месяц
+    после этого момента пометит их stale, и ни одно изменение не потеряется.
+    Если параллельный запрос создал часть из них раньше, откат отменяет всю пачку –
+    перечитываем, какие ключи всё ещё отсутствуют, и добавляем только их.
+    """
+    keys = {(m, t) for m in months for t in TransactionType}
+    for _ in range(attempts):
+        existing = {
+            (row.month, row.transaction_type)
+            for row in db.query(MonthlySketch.month, MonthlySketch.transaction_type)
+            .filter(MonthlySketch.user_id == user_id, MonthlySketch.month.in_(months))
+        }
+        missing = keys - existing
+        if not missing:
+            return
+        db.add_all([MonthlySketch(user_id=user_id, month=m, transaction_type=t, tx_count=0, stale=True) for m, t in missing])
+        try:
+            db.commit()
+            return
+        except IntegrityError:
+            db.rollback()   # параллельный запрос создал часть заготовок
+    raise RuntimeError(f"monthly_sketches: не удалось создать заготовки месяцев пользователя {user_id}")
+
+
+def ensure(user_id: int, months: List[datetime]) -> List[MonthlySketch]:
+    """
+    Актуальные скетчи месяцев (оба типа): недостающие создаются, stale пересобираются.
+    Работает в собственной сессии основной БД; возвращённые строки отсоединены от неё.
+    """
+    if not months:
+        return []
+    db = SessionLocal()
+    try:
+        _create_missing(db, user_id, months)
+
+        stale = (
+            db.query(MonthlySketch)
+            .filter(MonthlySketch.user_id == user_id, MonthlySketch.month.in_(months), MonthlySketch.stale.is_(True))
+            .with_for_update()
+            .all()
+        )
+        if stale:
+            _rebuild(db, user_id, stale)
+        db.commit()
+
+        return (
+            db.query(MonthlySketch)
+            .filter(MonthlySketch.user_id == user_id, MonthlySketch.month.in_(months))
+            .order_by(MonthlySketch.month)
+            .all()
+        )
+    finally:
+        db.close()
+
+
+def _summary(rows: List[MonthlySketch]) -> dict:
+    digest, hll, histogram = TDigest(), HyperLogLog(), Histogram()
+    count = 0
+    for row in rows:
+        if not row.tx_count:
+            continue
+        count += row.tx_count
+        digest.merge(TDigest.from_dict(json.loads(row.digest)))
+        hll.merge(HyperLogLog(registers=row.hll))
+        histogram.merge(Histogram(json.loads(row.histogram)))
+    return {
+        "count": count,
+        "min": digest.min,
+        "max": digest.max,
+        "percentiles": {name: digest.quantile(q) for name, q in QUANTILES.items()},
+        "histogram": histogram.buckets(),
+        "distinct_counterparties": hll.count() if count else 0,
+    }
+
+
+def distribution(
+    db: Session,
+    user_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    transaction_type: Optional[TransactionType] = None,
+) -> dict:
+    """
+    Процентили, гистограмма и приближённое число контрагентов за период
+    (с точностью до месяца) плюс те же показатели по каждому месяцу.
+    Период обрезается по датам транзакций пользователя: скетчи (и заготовки
+    в основной БД) заводятся только для месяцев, где данные могут быть.
+    """
+    first, last = (
+        db.query(func.min(Transaction.date_time), func.max(Transaction.date_time))
+        .filter(Transaction.user_id == user_id, Transaction.duplicate_of_id.is_(None))
+        .one()
+    )
+    if first is None:
+        return {"period_from": None, "period_to": None, **_summary([]), "monthly": []}
+    start = max(start, first) if start else first
+    end = min(end, last) if end else last
+    if start > end:
+        return {"period_from": None, "period_to": None, **_summary([]), "monthly": []}
+
+    rows = ensure(user_id, months_between(start, end))
+    if transaction_type is not None:
+        rows = [row for row in rows if row.transaction_type == transaction_type]
+
+    by_month: Dict[datetime, List[MonthlySketch]] = defaultdict(list)
+    for row in rows:
+        by_month[row.month].append(row)
+    monthly = []
+    for month, month_rows in sorted(by_month.items()):
+        summary = _summary(month_rows)
+        if summary["count"]:
+            monthly.append({
+                "period": month,
+                "count": summary["count"],
+                **summary["percentiles"],
+                "distinct_counterparties": summary["distinct_counterparties"],
+            })
+
+    return {
+        "period_from": month_start(start),
+        "period_to": next_month(month_start(end)),
+        **_summary(rows),
+        "monthly": monthly,
+    }
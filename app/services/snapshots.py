@@ -0,0 +1,560 @@
+# app/services/snapshots.py
+"""
+Снимки транзакций пользователя в отображаемых в память (mmap) колоночных файлах.
+
+Файл <SNAPSHOT_DIR>/user_<id>.snap (базовый снимок):
+    MAGIC (8 байт) | длина заголовка (uint64) | заголовок JSON | колонки
+Заголовок: версия данных пользователя (users.data_version) и курсор журнала
+изменений (transaction_changes.id), на которые снимок актуален, число строк,
+dtype и смещение каждой колонки, словари строковых колонок. Колонки – массивы
+фиксированной ширины (дата, сумма, коды перечислений и словарей), выровненные
+по 64 байта, строки упорядочены по id.
+
+Файл <SNAPSHOT_DIR>/user_<id>.log (журнал дельт): JSON-строки
+{"c": курсор, "v": версия, "rows": [строки], "del": [id]} – изменения после
+курсора базового снимка. Устаревший снимок догоняется на запросе только
+дописыванием дельты в журнал – O(изменений), без копирования колонок и
+перезаписи файла. Строки журнала держатся в памяти процесса поверх mmap.
+Когда журнал вырос до SNAPSHOT_LOG_MAX_ROWS, фоновый поток сливает его
+в новый базовый снимок (tmp + os.replace) и обнуляет журнал.
+
+Базовый снимок на пути запроса не строится: при его отсутствии статистика
+считается в БД, а снимок строится в фоне (или app/jobs/snapshots.py).
+Запись в журнал, слияние и построение одного пользователя сериализуются
+flock на <SNAPSHOT_DIR>/user_<id>.lock – воркеры делят одни файлы.
+"""
+import json
+import logging
+import mmap
+import os
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models.transaction import Transaction, TransactionStatus, TransactionType
+from app.db.models.user import User
+from app.db.session import SessionLocal
+from app.services import changes
+
+if os.name == "nt":
+    import msvcrt
+
+    def _lock_file(f) -> None:
+        # LK_LOCK ждёт около 10 с и бросает OSError – ждём дальше
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+
+    def _unlock_file(f) -> None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock_file(f) -> None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(f) -> None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"TXSNAP02"
+ALIGN = 64
+TYPES = list(TransactionType)
+STATUSES = list(TransactionStatus)
+# колонка -> dtype; строковые колонки хранятся кодами словаря (-1 = NULL)
+COLUMNS = {
+    "id": "<i8",
+    "ts": "<i8",            # секунды от эпохи (date_time, UTC); NULL_TS – даты нет
+    "amount": "<f8",
+    "type": "i1",           # индекс в TYPES
+    "status": "i1",         # индекс в STATUSES
+    "category": "<i4",
+    "sender_bank": "<i4",
+    "recipient_bank": "<i4",
+    "recipient_inn": "<i4",
+}
+DICT_COLUMNS = ("category", "sender_bank", "recipient_bank", "recipient_inn")
+EPOCH = datetime(1970, 1, 1)
+NULL_TS = np.iinfo(np.int64).min
+# строка журнала: (id, ts|None, amount, type, status, category, sender_bank, recipient_bank, recipient_inn)
+ROW_FIELDS = ("id", "ts", "amount", "type", "status", *DICT_COLUMNS)
+
+
+class Snapshot:
+    """Открытый базовый снимок: колонки – представления numpy поверх mmap (только чтение)"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.stat = os.fstat(f.fileno())
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:8] != MAGIC:
+            raise ValueError(f"{path}: not a snapshot file")
+        header_len = int.from_bytes(self._mm[8:16], "little")
+        header = json.loads(self._mm[16:16 + header_len])
+        self.path = path
+        self.data_version: int = header["data_version"]
+        self.cursor: int = header["cursor"]
+        self.rows: int = header["rows"]
+        self.dicts: Dict[str, List[str]] = header["dicts"]
+        self.columns = {
+            name: np.frombuffer(self._mm, dtype=np.dtype(dtype), count=self.rows, offset=offset)
+            for name, (dtype, offset) in header["columns"].items()
+        }
+
+    def is_current(self) -> bool:
+        """Файл на диске не заменён другим воркером"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        return (st.st_ino, st.st_mtime_ns) == (self.stat.st_ino, self.stat.st_mtime_ns)
+
+    def code(self, column: str, value) -> int:
+        """Код значения в словаре колонки; -2 – значения нет в снимке"""
+        if value is None:
+            return -1
+        try:
+            return self.dicts[column].index(value)
+        except ValueError:
+            return -2
+
+    def label(self, column: str, code: int):
+        return None if code < 0 else self.dicts[column][code]
+
+
+class View:
+    """
+    Базовый снимок + строки журнала дельт поверх него.
+    overlay: id -> строка журнала или None (удалена / дубликат).
+    """
+
+    def __init__(self, base: Snapshot, overlay: Dict[int, Optional[tuple]], cursor: int,
+                 data_version: int, log_offset: int):
+        self.base = base
+        self.overlay = overlay
+        self.cursor = cursor
+        self.data_version = data_version
+        self.log_offset = log_offset
+        # позиции строк базы, заменённых журналом (id в базе отсортированы)
+        ids = base.columns["id"]
+        keys = np.fromiter(overlay.keys(), dtype="<i8", count=len(overlay))
+        pos = np.searchsorted(ids, keys)
+        found = pos < len(ids)
+        found[found] = ids[pos[found]] == keys[found]
+        self.replaced = pos[found]
+        self.extra = [row for row in overlay.values() if row is not None]
+
+    @property
+    def rows(self) -> int:
+        return self.base.rows - len(self.replaced) + len(self.extra)
+
+    def applied(self, records: List[dict], log_offset: int) -> "View":
+        overlay = dict(self.overlay)
+        cursor, version = self.cursor, self.data_version
+        for record in records:
+            if record["c"] <= cursor and record["v"] <= version:
+                continue
+            _apply_record(overlay, record)
+            cursor, version = max(cursor, record["c"]), max(version, record["v"])
+        return View(self.base, overlay, cursor, version, log_offset)
+
+
+# ─────────────────────────── файлы ───────────────────────────
+def path_for(user_id: int) -> str:
+    return os.path.join(settings.SNAPSHOT_DIR, f"user_{user_id}.snap")
+
+
+def log_path_for(user_id: int) -> str:
+    return os.path.join(settings.SNAPSHOT_DIR, f"user_{user_id}.log")
+
+
+@contextmanager
+def _file_lock(user_id: int) -> Iterator[None]:
+    """Межпроцессная блокировка файлов пользователя"""
+    os.makedirs(settings.SNAPSHOT_DIR, exist_ok=True)
+    with open(os.path.join(settings.SNAPSHOT_DIR, f"user_{user_id}.lock"), "a+") as f:
+        _lock_file(f)
+        try:
+            yield
+        finally:
+            _unlock_file(f)
+
+
+def _write(path: str, data_version: int, cursor: int, cols: Dict[str, np.ndarray], dicts: Dict[str, List[str]]) -> None:
+    rows = len(cols["id"])
+    layout, offset = {}, 0
+    for name, dtype in COLUMNS.items():
+        layout[name] = [dtype, offset]
+        offset += -(-rows * np.dtype(dtype).itemsize // ALIGN) * ALIGN
+
+    # смещения колонок считаются от начала данных, выровненного по ALIGN
+    def header_bytes(base: int) -> bytes:
+        columns = {name: [dtype, base + off] for name, (dtype, off) in layout.items()}
+        return json.dumps({
+            "data_version": data_version, "cursor": cursor, "rows": rows, "columns": columns, "dicts": dicts,
+        }, ensure_ascii=False).encode()
+
+    base = ALIGN
+    while True:
+        header = header_bytes(base)
+        needed = -(-(16 + len(header)) // ALIGN) * ALIGN
+        if needed <= base:
+            break
+        base = needed
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(MAGIC + len(header).to_bytes(8, "little") + header)
+            for name, (dtype, off) in layout.items():
+                f.seek(base + off)
+                f.write(np.ascontiguousarray(cols[name], dtype=np.dtype(dtype)).tobytes())
+            f.truncate(base + offset)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def _read_log(user_id: int, offset: int = 0):
+    """Записи журнала с байта `offset` и новое смещение (недописанная последняя строка пропускается)"""
+    try:
+        with open(log_path_for(user_id), "rb") as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return [], 0
+    end = data.rfind(b"\n") + 1
+    records = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+    return records, offset + end
+
+
+def _append_log(user_id: int, record: dict) -> int:
+    with open(log_path_for(user_id), "ab") as f:
+        f.write(json.dumps(record, ensure_ascii=False).encode() + b"\n")
+        return f.tell()
+
+
+def _reset_log(user_id: int) -> None:
+    open(log_path_for(user_id), "wb").close()
+
+
+# ─────────────────────────── кодирование ───────────────────────────
+def _ts(dt: Optional[datetime]) -> Optional[int]:
+    return int((dt - EPOCH).total_seconds()) if dt is not None else None
+
+
+def _row(tx) -> tuple:
+    return (tx.id, _ts(tx.date_time), tx.amount, TYPES.index(TransactionType(tx.transaction_type)),
+            STATUSES.index(TransactionStatus(tx.status)), *[getattr(tx, name) for name in DICT_COLUMNS])
+
+
+def _apply_record(overlay: Dict[int, Optional[tuple]], record: dict) -> None:
+    for tx_id in record["del"]:
+        overlay[tx_id] = None
+    for row in record["rows"]:
+        overlay[row[0]] = tuple(row)
+
+
+def _encode(rows: List[tuple], dicts: Dict[str, List[str]]) -> Dict[str, np.ndarray]:
+    """Строки (кортежи ROW_FIELDS) -> колонки; словари дополняются новыми значениями"""
+    index = {name: {v: i for i, v in enumerate(values)} for name, values in dicts.items()}
+
+    def code(name, value):
+        if value is None:
+            return -1
+        i = index[name].get(value)
+        if i is None:
+            i = index[name][value] = len(dicts[name])
+            dicts[name].append(value)
+        return i
+
+    return {
+        "id": np.array([r[0] for r in rows], dtype="<i8"),
+        "ts": np.array([NULL_TS if r[1] is None else r[1] for r in rows], dtype="<i8"),
+        "amount": np.array([r[2] for r in rows], dtype="<f8"),
+        "type": np.array([r[3] for r in rows], dtype="i1"),
+        "status": np.array([r[4] for r in rows], dtype="i1"),
+        **{name: np.array([code(name, r[5 + i]) for r in rows], dtype="<i4") for i, name in enumerate(DICT_COLUMNS)},
+    }
+
+
+# ─────────────────────────── построение, журнал, слияние ───────────────────────────
+def build(db: Session, user_id: int) -> None:
+    """
+    Полный базовый снимок одним проходом по транзакциям пользователя (фон / задача).
+    Версия и курсор читаются до выборки: изменения, попавшие и в выборку,
+    и в журнал после курсора, при догонке просто применятся повторно.
+    """
+    with _file_lock(user_id):
+        data_version = db.query(User.data_version).filter(User.id == user_id).scalar() or 0
+        cursor = changes.latest_version(db, user_id)
+        txs = (
+            db.query(
+                Transaction.id, Transaction.date_time, Transaction.amount, Transaction.transaction_type,
+                Transaction.status, *[getattr(Transaction, name) for name in DICT_COLUMNS],
+            )
+            .filter(Transaction.user_id == user_id, Transaction.duplicate_of_id.is_(None))
+            .order_by(Transaction.id)
+            .all()
+        )
+        dicts = {name: [] for name in DICT_COLUMNS}
+        _write(path_for(user_id), data_version, cursor, _encode([_row(tx) for tx in txs], dicts), dicts)
+        _reset_log(user_id)
+    db.rollback()
+
+
+def _open_view(user_id: int) -> Optional[View]:
+    """Базовый снимок с диска + весь журнал. Вызывать под _file_lock."""
+    path = path_for(user_id)
+    if not os.path.exists(path):
+        return None
+    try:
+        base = Snapshot(path)
+    except (OSError, ValueError, KeyError):
+        logger.exception("snapshots: повреждённый файл %s – будет пересобран", path)
+        return None
+    records, offset = _read_log(user_id)
+    return View(base, {}, base.cursor, base.data_version, 0).applied(records, offset)
+
+
+def _catch_up(db: Session, user_id: int, view: Optional[View], data_version: int) -> Optional[View]:
+    """
+    Догоняет представление: чужие записи журнала (другие воркеры) + изменения
+    из БД после курсора, которые дописываются в журнал. O(изменений).
+    """
+    with _file_lock(user_id):
+        if view is None or not view.base.is_current():
+            view = _open_view(user_id)       # базовый снимок заменён слиянием
+            if view is None:
+                return None
+        else:
+            records, offset = _read_log(user_id, view.log_offset)
+            view = view.applied(records, offset)
+        if view.data_version >= data_version:
+            return view
+
+        cursor, dels, rows = view.cursor, [], {}
+        for batch, cursor, _ in changes.iter_batches(db, user_id, view.cursor):
+            for _, op, tx_id, tx in batch:
+                rows.pop(tx_id, None)
+                # дубликат в снимок не входит – как удалённая строка
+                if op == changes.UPSERT and tx.duplicate_of_id is None:
+                    rows[tx_id] = _row(tx)
+                else:
+                    dels.append(tx_id)
+            db.expunge_all()
+        record = {"c": cursor, "v": data_version, "rows": list(rows.values()),
+                  "del": [tx_id for tx_id in dict.fromkeys(dels) if tx_id not in rows]}
+        offset = _append_log(user_id, record)
+        return view.applied([record], offset)
+
+
+def compact(user_id: int) -> None:
+    """Сливает журнал в новый базовый снимок: O(строк), только в фоне / задаче"""
+    with _file_lock(user_id):
+        view = _open_view(user_id)
+        if view is None or not view.overlay:
+            return
+        base, keep = view.base, np.ones(view.base.rows, dtype=bool)
+        keep[view.replaced] = False
+        dicts = {name: list(values) for name, values in base.dicts.items()}
+        added = _encode(view.extra, dicts)
+        cols = {name: np.concatenate([base.columns[name][keep], added[name]]) for name in COLUMNS}
+        order = np.argsort(cols["id"], kind="stable")
+        _write(path_for(user_id), view.data_version, view.cursor, {n: c[order] for n, c in cols.items()}, dicts)
+        _reset_log(user_id)
+
+
+def warm(db: Session, user) -> None:
+    """Для задачи прогрева: строит отсутствующий снимок, иначе догоняет и сливает журнал"""
+    if _catch_up(db, user.id, None, user.data_version) is None:
+        build(db, user.id)
+    else:
+        compact(user.id)
+
+
+# ─────────────────────────── фоновые задачи процесса ───────────────────────────
+_background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshots")
+_pending = set()
+
+
+def _run_background(kind: str, user_id: int) -> None:
+    try:
+        if kind == "build":
+            db = SessionLocal()
+            try:
+                build(db, user_id)
+            finally:
+                db.close()
+        else:
+            compact(user_id)
+    except Exception:
+        logger.exception("snapshots: фоновая задача %s для пользователя %s не удалась", kind, user_id)
+    finally:
+        with _lock:
+            _pending.discard((kind, user_id))
+
+
+def _schedule(kind: str, user_id: int) -> None:
+    with _lock:
+        if (kind, user_id) in _pending:
+            return
+        _pending.add((kind, user_id))
+    _background.submit(_run_background, kind, user_id)
+
+
+# ─────────────────────────── открытые представления процесса ───────────────────────────
+_views: "OrderedDict[int, View]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _remember(user_id: int, view: View) -> None:
+    with _lock:
+        _views[user_id] = view
+        _views.move_to_end(user_id)
+        while len(_views) > settings.SNAPSHOT_MAX_OPEN:
+            _views.popitem(last=False)
+
+
+def current(db: Session, user) -> Optional[View]:
+    """
+    Представление, актуальное на user.data_version (версия читается вместе с пользователем
+    при авторизации – лишнего запроса нет). Устаревшее догоняется дописыванием дельты
+    в журнал; отсутствующий снимок строится в фоне. None – снимки выключены, ещё
+    не построены или не удалось: вызывающий идёт в БД.
+    """
+    if not settings.SNAPSHOTS_ENABLED:
+        return None
+    with _lock:
+        view = _views.get(user.id)
+    if view is not None and view.data_version >= user.data_version:
+        return view
+    try:
+        view = _catch_up(db, user.id, view, user.data_version)
+    except Exception:
+        logger.exception("snapshots: не удалось обновить снимок пользователя %s", user.id)
+        return None
+    if view is None:
+        _schedule("build", user.id)
+        return None
+    _remember(user.id, view)
+    if len(view.overlay) >= settings.SNAPSHOT_LOG_MAX_ROWS:
+        _schedule("compact", user.id)
+    return view
+
+
+# ─────────────────────────── статистика по снимку ───────────────────────────
+def _to_ts(dt: datetime) -> int:
+    return int((dt - EPOCH).total_seconds())
+
+
+def stats(view: View, start: Optional[datetime] = None, end: Optional[datetime] = None, status=None,
+          transaction_type=None, min_amount: Optional[float] = None, max_amount: Optional[float] = None,
+          category: Optional[str] = None, sender_bank: Optional[str] = None,
+          recipient_bank: Optional[str] = None, recipient_inn: Optional[str] = None) -> dict:
+    """
+    Тот же ответ, что и SQL-ветка /transactions/stats: векторно по колонкам базового
+    снимка плюс строки журнала. Транзакции без даты, как и в SQL, не проходят фильтр
+    по датам и попадают в monthly отдельной группой period=None (в конце).
+    """
+    snap, c = view.base, view.base.columns
+    status_code = STATUSES.index(TransactionStatus(status)) if status is not None else None
+    type_code = TYPES.index(TransactionType(transaction_type)) if transaction_type is not None else None
+    strings = {"category": category, "sender_bank": sender_bank,
+               "recipient_bank": recipient_bank, "recipient_inn": recipient_inn}
+
+    # ── базовый снимок ──
+    mask = np.ones(snap.rows, dtype=bool)
+    mask[view.replaced] = False
+    if start is not None:
+        mask &= (c["ts"] != NULL_TS) & (c["ts"] >= _to_ts(start))
+    if end is not None:
+        mask &= (c["ts"] != NULL_TS) & (c["ts"] <= _to_ts(end))
+    if status_code is not None:
+        mask &= c["status"] == status_code
+    if type_code is not None:
+        mask &= c["type"] == type_code
+    if min_amount is not None:
+        mask &= c["amount"] >= min_amount
+    if max_amount is not None:
+        mask &= c["amount"] <= max_amount
+    for name, value in strings.items():
+        if value:
+            mask &= c[name] == snap.code(name, value)
+
+    amount, types, ts = c["amount"][mask], c["type"][mask], c["ts"][mask]
+    dated = ts != NULL_TS
+    months = Counter()
+    keys, n = np.unique(ts[dated].astype("datetime64[s]").astype("datetime64[M]"), return_counts=True)
+    for k, v in zip(keys, n):
+        months[k.astype("datetime64[s]").item()] += int(v)
+    if (~dated).any():
+        months[None] += int((~dated).sum())
+
+    def counts(values, label) -> Counter:
+        keys, n = np.unique(values, return_counts=True)
+        return Counter({label(k): int(v) for k, v in zip(keys, n)})
+
+    by_type = counts(types, lambda k: TYPES[k])
+    by_status = counts(c["status"][mask], lambda k: STATUSES[k])
+    by_sender = counts(c["sender_bank"][mask], lambda k: snap.label("sender_bank", k))
+    by_recipient = counts(c["recipient_bank"][mask], lambda k: snap.label("recipient_bank", k))
+    income = float(amount[types == TYPES.index(TransactionType.income)].sum())
+    expense = float(amount[types == TYPES.index(TransactionType.expense)].sum())
+
+    # ── строки журнала (их не больше SNAPSHOT_LOG_MAX_ROWS) ──
+    start_ts = _to_ts(start) if start is not None else None
+    end_ts = _to_ts(end) if end is not None else None
+    for row in view.extra:
+        r = dict(zip(ROW_FIELDS, row))
+        if (start_ts is not None or end_ts is not None) and r["ts"] is None:
+            continue
+        if (start_ts is not None and r["ts"] < start_ts) or (end_ts is not None and r["ts"] > end_ts):
+            continue
+        if (status_code is not None and r["status"] != status_code) or (type_code is not None and r["type"] != type_code):
+            continue
+        if (min_amount is not None and r["amount"] < min_amount) or (max_amount is not None and r["amount"] > max_amount):
+            continue
+        if any(value and r[name] != value for name, value in strings.items()):
+            continue
+        if r["ts"] is None:
+            months[None] += 1
+        else:
+            dt = EPOCH + timedelta(seconds=r["ts"])
+            months[datetime(dt.year, dt.month, 1)] += 1
+        by_type[TYPES[r["type"]]] += 1
+        by_status[STATUSES[r["status"]]] += 1
+        by_sender[r["sender_bank"]] += 1
+        by_recipient[r["recipient_bank"]] += 1
+        if r["type"] == TYPES.index(TransactionType.income):
+            income += r["amount"]
+        else:
+            expense += r["amount"]
+
+    return {
+        "monthly": [{"period": p, "count": months[p]}
+                    for p in sorted(months, key=lambda p: (p is None, p or EPOCH))],
+        "by_type": [{"type": t, "count": n} for t, n in by_type.items()],
+        "sums": {"income": income, "expense": expense},
+        "by_status": [{"status": s, "count": n} for s, n in by_status.items()],
+        "by_sender_bank": [{"bank": b, "count": n} for b, n in by_sender.items()],
+        "by_recipient_bank": [{"bank": b, "count": n} for b, n in by_recipient.items()],
+    }
@@ -1,11 +1,25 @@
 #/app/services
-from http.client import HTTPException
+from datetime import datetime
 
+from fastapi import HTTPException
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 from app.db.models.transaction import Transaction
+from app.db.models.user import User
 from app.schemas.transaction import TransactionCreate, TransactionUpdate
+from app.services import budgets, changes, counterparty, events, idempotency, monitoring, sketches
+from app.services.tx_state import state_of
+from app.utils.fingerprint import fingerprint_of
+
+# Поля, от которых зависит отпечаток транзакции
+FINGERPRINT_FIELDS = {"transaction_type", "amount", "date_time", "recipient_inn", "sender_account", "recipient_account"}
+# Поля, от которых зависят итоги по контрагентам
+COUNTERPARTY_FIELDS = {"transaction_type", "amount", "date_time", "recipient_inn", "recipient_bank", "recipient_account"}
+# Поля, от которых зависят помесячные скетчи распределений
+SKETCH_FIELDS = {"transaction_type", "amount", "date_time", "recipient_inn"}
+# Поля, от которых зависит расход бюджетов
+BUDGET_FIELDS = {"transaction_type", "status", "amount", "date_time", "category"}
 
 def get_transactions(db: Session, user_id: int) -> List[Transaction]:
     return db.query(Transaction).filter(Transaction.user_id == user_id).all()
@@ -13,26 +27,260 @@ def get_transactions(db: Session, user_id: int) -> List[Transaction]:
 def get_transaction(db: Session, transaction_id: int, user_id: int) -> Optional[Transaction]:
     return db.query(Transaction).filter(Transaction.id == transaction_id, Transaction.user_id == user_id).first()
 
-def create_transaction(db: Session, transaction_data: TransactionCreate, user_id: int) -> Transaction:
+def _get_for_write(db: Session, transaction_id: int, user_id: int) -> Optional[Transaction]:
+    """Транзакция, перечитанная под блокировкой пользователя (не из identity map сессии)"""
+    return (
+        db.query(Transaction)
+        .filter(Transaction.id == transaction_id, Transaction.user_id == user_id)
+        .populate_existing()
+        .first()
+    )
+
+def touch_user_data(db: Session, user_id: int) -> None:
+    """
+    Увеличивает версию данных пользователя в той же транзакции БД, что и запись.
+    По версии строятся ETag / Last-Modified для /transactions/ и /transactions/stats.
+    UPDATE блокирует строку users до commit, поэтому вызывается первым шагом записи:
+    поиск дубликатов и вставка новых контрагентов идут уже под блокировкой,
+    и параллельные записи одного пользователя выполняются по очереди.
+    """
+    db.query(User).filter(User.id == user_id).update(
+        {User.data_version: User.data_version + 1, User.data_updated_at: datetime.utcnow()},
+        synchronize_session=False,
+    )
+
+def find_duplicate(db: Session, user_id: int, fingerprint: str, exclude_id: Optional[int] = None) -> Optional[int]:
+    """
+    id самой ранней транзакции-оригинала пользователя с таким отпечатком (индекс user_id + fingerprint).
+    Помеченные дубликаты оригиналом не считаются – иначе две строки могли бы ссылаться друг на друга.
+    """
+    q = db.query(Transaction.id).filter(
+        Transaction.user_id == user_id,
+        Transaction.fingerprint == fingerprint,
+        Transaction.duplicate_of_id.is_(None),
+    )
+    if exclude_id is not None:
+        q = q.filter(Transaction.id != exclude_id)
+    row = q.order_by(Transaction.id).first()
+    return row[0] if row else None
+
+def _promote_duplicates(db: Session, user_id: int, original_id: int) -> Tuple[List[int], list, list]:
+    """
+    Транзакция перестаёт быть оригиналом (удаляется или меняет отпечаток):
+    самый ранний её дубликат становится оригиналом и входит в агрегаты,
+    остальные ссылаются на него. Возвращает (id изменённых строк,
+    [состояние до], [состояние после]) нового оригинала – для «минус старое, плюс новое».
+    """
+    rows = (
+        db.query(Transaction)
+        .filter(Transaction.user_id == user_id, Transaction.duplicate_of_id == original_id)
+        .order_by(Transaction.id)
+        .populate_existing()
+        .all()
+    )
+    if not rows:
+        return [], [], []
+    head = rows[0]
+    before = state_of(head)
+    head.duplicate_of_id = None
+    for row in rows[1:]:
+        row.duplicate_of_id = head.id
+    db.flush()
+    return [row.id for row in rows], [before], [state_of(head)]
+
+def create_transaction(
+    db: Session, transaction_data: TransactionCreate, user_id: int, skip_duplicates: bool = False,
+    idempotent: Optional[idempotency.Idempotent] = None,
+) -> Transaction:
+    """
+    Дубликат (тот же отпечаток) при skip_duplicates=True отклоняется с 409,
+    иначе сохраняется с пометкой duplicate_of_id.
+    С idempotent ответ сохраняется под ключом в той же транзакции БД.
+    """
+    touch_user_data(db, user_id)
+    idempotency.recheck(db, user_id, idempotent)
     transaction = Transaction(**transaction_data.dict(), user_id=user_id)
+    transaction.fingerprint = fingerprint_of(transaction)
+    transaction.duplicate_of_id = find_duplicate(db, user_id, transaction.fingerprint)
+    if transaction.duplicate_of_id and skip_duplicates:
+        db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Duplicate transaction", "duplicate_of_id": transaction.duplicate_of_id},
+        )
+    cps = counterparty.apply(db, user_id, added=[state_of(transaction)])
+    transaction.counterparty_id = cps[transaction.recipient_inn].id
     db.add(transaction)
+    db.flush()
+    sketches.invalidate(db, user_id, [state_of(transaction)])
+    budgets.apply(db, user_id, added=[state_of(transaction)])
+    changes.record(db, user_id, [transaction.id])
+    events.publish(db, user_id, events.build_delta("create", after=[state_of(transaction)]))
+    monitoring.process(db, user_id, [transaction])
+    if idempotent:
+        idempotency.remember(db, user_id, idempotent, transaction)
     db.commit()
     db.refresh(transaction)
     return transaction
 
+def create_transactions_bulk(
+    db: Session, items: List[TransactionCreate], user_id: int, skip_duplicates: bool = True,
+    idempotent: Optional[idempotency.Idempotent] = None,
+) -> Tuple[List[Transaction], List[Tuple[int, int]]]:
+    """
+    Импорт пачки транзакций одним commit.
+    Дубликаты ищутся одним запросом по индексу (user_id, fingerprint) для всей пачки
+    плюс словарь отпечатков внутри пачки – O(1) на строку.
+    Возвращает (созданные, [(индекс в пачке, id оригинала)] для пропущенных).
+    """
+    touch_user_data(db, user_id)
+    idempotency.recheck(db, user_id, idempotent)
+    rows = [Transaction(**item.dict(), user_id=user_id) for item in items]
+    for row in rows:
+        row.fingerprint = fingerprint_of(row)
+
+    known = {}
+    fingerprints = list({row.fingerprint for row in rows})
+    for i in range(0, len(fingerprints), 1000):
+        chunk = fingerprints[i:i + 1000]
+        for tx_id, fp in (
+            db.query(Transaction.id, Transaction.fingerprint)
+            .filter(
+                Transaction.user_id == user_id,
+                Transaction.fingerprint.in_(chunk),
+                Transaction.duplicate_of_id.is_(None),
+            )
+            .order_by(Transaction.id.desc())
+        ):
+            known[fp] = tx_id   # по убыванию id -> остаётся самая ранняя
+
+    created, skipped, first_in_batch, batch_dups = [], [], {}, []
+    for index, row in enumerate(rows):
+        original = known.get(row.fingerprint) or first_in_batch.get(row.fingerprint)
+        if original is not None and skip_duplicates:
+            skipped.append((index, original))
+            continue
+        if isinstance(original, int):
+            row.duplicate_of_id = original
+        elif original is not None:
+            batch_dups.append((row, original))
+        first_in_batch.setdefault(row.fingerprint, row)
+        created.append(row)
+
+    if created:
+        # дубликаты внутри пачки получат duplicate_of_id только после flush – помечаем их состояния заранее
+        in_batch_dup = {id(row) for row, _ in batch_dups}
+        cps = counterparty.apply(db, user_id, added=[
+            state_of(row)._replace(duplicate=True) if id(row) in in_batch_dup else state_of(row) for row in created
+        ])
+        for row in created:
+            row.counterparty_id = cps[row.recipient_inn].id
+        db.add_all(created)
+        db.flush()
+        # дубликаты внутри пачки ссылаются на строки, получившие id только после flush
+        for row, original in batch_dups:
+            row.duplicate_of_id = original.id
+        sketches.invalidate(db, user_id, [state_of(row) for row in created])
+        budgets.apply(db, user_id, added=[state_of(row) for row in created])
+        changes.record(db, user_id, [row.id for row in created])
+        events.publish(db, user_id, events.build_delta("create", after=[state_of(row) for row in created]))
+        monitoring.process(db, user_id, created)
+    skipped = [(i, orig if isinstance(orig, int) else orig.id) for i, orig in skipped]
+    ids = [row.id for row in created]
+    if idempotent:
+        idempotency.remember(db, user_id, idempotent, (created, skipped))
+    db.commit()
+
+    # после commit объекты «протухли» – перечитываем их одним запросом, а не по одному
+    if ids:
+        db.query(Transaction).filter(Transaction.id.in_(ids)).all()
+    return created, skipped
+
 def update_transaction(db: Session, transaction_id: int, transaction_data: TransactionUpdate, user_id: int) -> Transaction:
-    transaction = get_transaction(db, transaction_id, user_id)
+    touch_user_data(db, user_id)
+    transaction = _get_for_write(db, transaction_id, user_id)
     if not transaction:
+        db.rollback()
         raise HTTPException(status_code=404, detail="Transaction not found")
 
-    for key, value in transaction_data.dict(exclude_unset=True).items():
+    before = state_of(transaction)
+    old_fingerprint = transaction.fingerprint
+    updates = transaction_data.dict(exclude_unset=True)
+    for key, value in updates.items():
         setattr(transaction, key, value)
+    promoted, p_before, p_after = [], [], []
+    if FINGERPRINT_FIELDS & updates.keys():
+        transaction.fingerprint = fingerprint_of(transaction)
+        # форма редактирования присылает запись целиком – при том же отпечатке пометки не трогаем
+        if transaction.fingerprint != old_fingerprint:
+            promoted, p_before, p_after = _promote_duplicates(db, user_id, transaction.id)
+            transaction.duplicate_of_id = find_duplicate(db, user_id, transaction.fingerprint, exclude_id=transaction.id)
+    after = state_of(transaction)
+    # пометка дубликата включает / исключает транзакцию из всех агрегатов
+    dup_changed = before.duplicate != after.duplicate or bool(promoted)
+    if COUNTERPARTY_FIELDS & updates.keys() or dup_changed:
+        cps = counterparty.apply(db, user_id, added=[after, *p_after], removed=[before, *p_before])
+        transaction.counterparty_id = cps[transaction.recipient_inn].id
+    if SKETCH_FIELDS & updates.keys() or dup_changed:
+        sketches.invalidate(db, user_id, [before, after, *p_after])
+    if BUDGET_FIELDS & updates.keys() or dup_changed:
+        budgets.apply(db, user_id, added=[after, *p_after], removed=[before, *p_before])
+    changes.record(db, user_id, [transaction.id, *promoted])
+    events.publish(db, user_id, events.build_delta("update", before=[before, *p_before], after=[after, *p_after]))
     db.commit()
     db.refresh(transaction)
     return transaction
 
+def update_status_bulk(
+    db: Session, user_id: int, ids: List[int], new_status, from_status=None
+) -> List[int]:
+    """
+    Смена статуса пачки транзакций одним commit (сверка с выпиской и т.п.).
+    Строки читаются и обновляются чанками по 1000 id; при from_status меняются только транзакции
+    в этом статусе. Итоги контрагентов от статуса не зависят, поэтому не трогаются;
+    расход бюджетов пересчитывается (отмена / возврат списания его уменьшает).
+    Возвращает id изменённых транзакций.
+    """
+    touch_user_data(db, user_id)
+    ids = list(dict.fromkeys(ids))
+    rows = []
+    for i in range(0, len(ids), 1000):
+        q = db.query(Transaction).filter(Transaction.user_id == user_id, Transaction.id.in_(ids[i:i + 1000]))
+        q = q.populate_existing()
+        if from_status is not None:
+            q = q.filter(Transaction.status == from_status)
+        rows.extend(row for row in q if row.status != new_status)
+    if not rows:
+        db.rollback()
+        return []
+
+    before = [state_of(row) for row in rows]
+    updated = [row.id for row in rows]
+    for i in range(0, len(updated), 1000):
+        db.query(Transaction).filter(Transaction.id.in_(updated[i:i + 1000])).update(
+            {Transaction.status: new_status}, synchronize_session=False
+        )
+    after = [s._replace(status=new_status) for s in before]
+    budgets.apply(db, user_id, added=after, removed=before)
+    changes.record(db, user_id, updated)
+    events.publish(db, user_id, events.build_delta("update", before=before, after=after))
+    db.commit()
+    return updated
+
 def delete_transaction(db: Session, transaction_id: int, user_id: int) -> None:
-    transaction = get_transaction(db, transaction_id, user_id)
-    if transaction:
-        db.delete(transaction)
-        db.commit()
+    touch_user_data(db, user_id)
+    transaction = _get_for_write(db, transaction_id, user_id)
+    if not transaction:
+        db.rollback()
+        return
+    before = state_of(transaction)
+    # без этого FK (ON DELETE SET NULL) молча сделал бы оригиналами все дубликаты мимо агрегатов
+    promoted, p_before, p_after = _promote_duplicates(db, user_id, transaction.id)
+    counterparty.apply(db, user_id, added=p_after, removed=[before, *p_before])
+    db.delete(transaction)
+    sketches.invalidate(db, user_id, [before, *p_after])
+    budgets.apply(db, user_id, added=p_after, removed=[before, *p_before])
+    changes.record(db, user_id, [before.id], changes.DELETE)
+    changes.record(db, user_id, promoted)
+    events.publish(db, user_id, events.build_delta("delete", before=[before, *p_before], after=p_after))
+    db.commit()
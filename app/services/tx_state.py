@@ -0,0 +1,32 @@
+# app/services/tx_state.py
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+
+class TxState(NamedTuple):
+    """
+    Снимок полей транзакции, от которых зависят производные данные
+    (агрегаты контрагентов и т.п.). Берётся до и после записи, чтобы
+    применить изменение как «минус старое, плюс новое».
+    duplicate – транзакция помечена дубликатом (duplicate_of_id) и в агрегаты не входит.
+    """
+    id: Optional[int]
+    user_id: int
+    transaction_type: object
+    status: object
+    amount: float
+    date_time: Optional[datetime]
+    category: Optional[str]
+    sender_bank: Optional[str]
+    recipient_bank: Optional[str]
+    recipient_inn: str
+    recipient_account: Optional[str]
+    duplicate: bool = False
+
+
+def state_of(tx) -> TxState:
+    return TxState(
+        tx.id, tx.user_id, tx.transaction_type, tx.status, tx.amount, tx.date_time,
+        tx.category, tx.sender_bank, tx.recipient_bank, tx.recipient_inn, tx.recipient_account,
+        tx.duplicate_of_id is not None,
+    )
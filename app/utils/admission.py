@@ -0,0 +1,262 @@
+# app/utils/admission.py
+"""
+Контроль допуска для тяжёлых endpoint'ов (/reports, статистика).
+
+Каждый маршрут закрыт своим «шлюзом» – взвешенным семафором на процесс:
+* ёмкость в единицах стоимости (тяжёлый отчёт занимает несколько единиц,
+  стоимость оценивается по ожидаемому числу строк до начала рендеринга);
+* лимит одновременных запросов одного пользователя (включая ожидающих);
+* ограниченная очередь FIFO с таймаутом ожидания.
+
+Не допущенный запрос получает 429 с Retry-After сразу, а не занимает
+соединения пула БД и CPU – лёгкие маршруты (/transactions/ и т.п.) не страдают.
+Ожидание в очереди асинхронное (future в цикле событий): оно не держит ни поток
+пула FastAPI, ни соединение с БД – маршрут отдаёт соединение до acquire().
+Освобождение места возможно из любого потока (рендеринг, поток ответа).
+"""
+import asyncio
+import json
+import math
+import threading
+import time
+from collections import Counter, deque
+from typing import Iterable, Iterator, Optional
+
+from fastapi import Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Query
+
+from app.core.config import settings
+from app.dependencies.oauth2 import oauth2_scheme
+from app.utils.security import verify_token
+
+
+class Slot:
+    """Занятое место в шлюзе; release() идемпотентен"""
+
+    def __init__(self, gate: "Gate", user_key, weight: int):
+        self.gate = gate
+        self.user_key = user_key
+        self.weight = weight
+        self.started = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self.gate._release(self)
+
+    def __enter__(self) -> "Slot":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class _Waiter:
+    """Запрос в очереди шлюза; granted выставляется под блокировкой шлюза"""
+    __slots__ = ("user_key", "weight", "loop", "future", "granted")
+
+    def __init__(self, user_key, weight: int, loop: asyncio.AbstractEventLoop):
+        self.user_key = user_key
+        self.weight = weight
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class Gate:
+    def __init__(self, name: str, capacity: int, per_user: int, max_queue: int, timeout: float):
+        self.name = name
+        self.capacity = capacity
+        self.per_user = per_user
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._used = 0
+        self._queue = deque()
+        self._users = Counter()     # запросы пользователя: выполняющиеся + ожидающие
+        self._avg_hold = 1.0        # скользящее среднее времени занятости места, сек
+
+    def _reject(self, reason: str) -> HTTPException:
+        # оценка: сколько «оборотов» шлюза нужно, чтобы дошла очередь
+        turns = (len(self._queue) + 1) / max(self.capacity, 1)
+        retry_after = max(1, math.ceil(self._avg_hold * max(turns, 1)))
+        return HTTPException(
+            status_code=429,
+            detail={"message": reason, "route": self.name},
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    async def acquire(self, user_key, weight: int = 1) -> Slot:
+        """
+        Занимает `weight` единиц ёмкости для пользователя `user_key` (id или e-mail) или бросает 429.
+        Ждёт в цикле событий, не занимая поток; вызывать без открытого соединения с БД.
+        """
+        if not settings.ADMISSION_ENABLED:
+            return Slot(self, user_key, 0)
+        weight = max(1, min(weight, self.capacity))
+        with self._lock:
+            if self._users[user_key] >= self.per_user:
+                raise self._reject("Too many concurrent requests for this user")
+            if not self._queue and self._used + weight <= self.capacity:
+                self._users[user_key] += 1
+                self._used += weight
+                return Slot(self, user_key, weight)
+            if len(self._queue) >= self.max_queue:
+                raise self._reject("Server is busy")
+            waiter = _Waiter(user_key, weight, asyncio.get_running_loop())
+            self._queue.append(waiter)
+            self._users[user_key] += 1
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.timeout)
+        except BaseException as exc:
+            # таймаут или отмена (клиент ушёл): место могло быть выдано в последний момент
+            timed_out = isinstance(exc, asyncio.TimeoutError)
+            with self._lock:
+                if waiter.granted and timed_out:
+                    return Slot(self, user_key, weight)
+                if waiter.granted:
+                    self._used -= weight
+                else:
+                    self._queue.remove(waiter)
+                self._drop_user(user_key)
+                self._grant()
+                if timed_out:
+                    raise self._reject("Timed out waiting for capacity")
+            raise
+        return Slot(self, user_key, weight)
+
+    def _drop_user(self, user_key) -> None:
+        self._users[user_key] -= 1
+        if self._users[user_key] <= 0:
+            del self._users[user_key]
+
+    def _grant(self) -> None:
+        """Выдаёт места ожидающим по порядку очереди. Вызывать под self._lock."""
+        while self._queue and self._used + self._queue[0].weight <= self.capacity:
+            waiter = self._queue.popleft()
+            self._used += waiter.weight
+            waiter.granted = True
+            try:
+                waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+            except RuntimeError:
+                # цикл событий ожидающего уже закрыт – место возвращается
+                self._used -= waiter.weight
+                self._drop_user(waiter.user_key)
+
+    def _release(self, slot: Slot) -> None:
+        if not slot.weight:
+            return
+        held = time.monotonic() - slot.started
+        with self._lock:
+            self._used -= slot.weight
+            self._drop_user(slot.user_key)
+            self._avg_hold = 0.8 * self._avg_hold + 0.2 * held
+            self._grant()
+
+    def stream(self, slot: Slot, body: Iterable) -> Iterator:
+        """
+        Оборачивает тело StreamingResponse: место освобождается, когда поток закончен или оборван.
+        Если клиент отключился до начала потока, генератор не стартует и finally не выполнится –
+        поэтому ответ отдаётся через GatedStreamingResponse (release идемпотентен).
+        """
+        try:
+            yield from body
+        finally:
+            slot.release()
+
+    def weight_of(self, query: Query) -> int:
+        """Стоимость выборки; оценка ограничена строками, при которых стоимость уже максимальна"""
+        return weight_for_rows(estimate_rows(query, limit=self.capacity * settings.ADMISSION_ROWS_PER_UNIT))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"capacity": self.capacity, "used": self._used, "queued": len(self._queue),
+                    "users": len(self._users), "avg_hold_seconds": round(self._avg_hold, 3)}
+
+
+class GatedStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse, освобождающий место шлюза при любом завершении отправки:
+    поток дочитан, клиент отключился до первого байта, ошибка записи в сокет,
+    отмена задачи. BackgroundTask для этого не годится – при ошибке отправки
+    Starlette его не запускает.
+    """
+
+    def __init__(self, slot: Slot, content, **kwargs):
+        super().__init__(content, **kwargs)
+        self.slot = slot
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.slot.release()
+
+
+def estimate_rows(query: Query, limit: Optional[int] = None) -> int:
+    """
+    Ожидаемое число строк выборки до её выполнения: оценка планировщика
+    PostgreSQL (EXPLAIN без ANALYZE – запрос не выполняется), иначе COUNT
+    не более чем по `limit` строкам – до допуска не читаем всю выборку.
+    """
+    session = query.session
+    if session.get_bind().dialect.name != "postgresql":
+        q = query.order_by(None)
+        return (q.limit(limit) if limit else q).count()
+
+    # параметры передаются с типами колонок, чтобы перечисления ушли в БД как в обычном запросе
+    compiled = query.statement.compile(
+        dialect=postgresql.dialect(paramstyle="named"), compile_kwargs={"render_postcompile": True}
+    )
+    params = [
+        bindparam(name, value, type_=compiled.binds[name].type) if name in compiled.binds else bindparam(name, value)
+        for name, value in compiled.params.items()
+    ]
+    plan = session.execute(text(f"EXPLAIN (FORMAT JSON) {compiled.string}").bindparams(*params)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def weight_for_rows(rows: int) -> int:
+    """Стоимость в единицах шлюза: одна единица на каждые ADMISSION_ROWS_PER_UNIT строк"""
+    return 1 + rows // settings.ADMISSION_ROWS_PER_UNIT
+
+
+reports_gate = Gate(
+    "reports",
+    settings.ADMISSION_REPORTS_CAPACITY,
+    settings.ADMISSION_REPORTS_PER_USER,
+    settings.ADMISSION_REPORTS_QUEUE,
+    settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+)
+stats_gate = Gate(
+    "stats",
+    settings.ADMISSION_STATS_CAPACITY,
+    settings.ADMISSION_STATS_PER_USER,
+    settings.ADMISSION_STATS_QUEUE,
+    settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+)
+
+
+async def stats_admission(token: str = Depends(oauth2_scheme)):
+    """
+    Зависимость для маршрутов статистики: место в stats_gate на время запроса.
+    Объявляется в dependencies маршрута – решается до get_read_db, поэтому
+    ожидание не держит соединение с БД.
+    """
+    slot = await stats_gate.acquire(verify_token(token).get("sub"))
+    try:
+        yield
+    finally:
+        slot.release()
@@ -0,0 +1,44 @@
+# app/utils/fingerprint.py
+import hashlib
+import re
+from datetime import datetime
+from typing import Optional
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+def _norm_account(value: Optional[str]) -> str:
+    # счета в выписках пишут с пробелами/дефисами – оставляем только цифры
+    return _NON_DIGITS.sub("", value or "")
+
+
+def transaction_fingerprint(
+    transaction_type,
+    amount: float,
+    date_time: datetime,
+    recipient_inn: str,
+    sender_account: Optional[str],
+    recipient_account: Optional[str],
+) -> str:
+    """
+    Нормализованный отпечаток транзакции: тип, сумма (до копеек), дата (без времени),
+    ИНН и счета. Совпадение отпечатков у одного пользователя = дубликат
+    (например, пересекающиеся выписки при импорте).
+    """
+    raw = "|".join((
+        getattr(transaction_type, "name", str(transaction_type)),
+        f"{round(float(amount), 2):.2f}",
+        date_time.date().isoformat() if date_time else "",
+        (recipient_inn or "").strip(),
+        _norm_account(sender_account),
+        _norm_account(recipient_account),
+    ))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def fingerprint_of(tx) -> str:
+    """Отпечаток ORM-объекта / схемы с полями транзакции"""
+    return transaction_fingerprint(
+        tx.transaction_type, tx.amount, tx.date_time,
+        tx.recipient_inn, tx.sender_account, tx.recipient_account,
+    )
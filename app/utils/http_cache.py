@@ -0,0 +1,84 @@
+# app/utils/http_cache.py
+import hashlib
+from email.utils import format_datetime, parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import Request, Response
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware
+
+# Ответы привязаны к пользователю (Authorization), поэтому кэш только приватный
+# и с обязательной перепроверкой: браузер каждый раз шлёт If-None-Match
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(request: Request, user, *resolved) -> str:
+    """
+    ETag = хэш от (пути, query-параметров, id пользователя, версии его данных).
+    Версия растёт на каждой записи транзакций (см. services.transaction.touch_user_data),
+    поэтому при неизменных данных и фильтрах ETag тоже не меняется.
+    `resolved` – параметры, которых нет в URL, но от которых зависит ответ
+    (например, период по умолчанию от текущей даты).
+    """
+    raw = f"{request.url.path}?{request.url.query}|{user.id}|{user.data_version}"
+    if resolved:
+        raw += "|" + "|".join(str(part) for part in resolved)
+    return f'W/"{hashlib.sha1(raw.encode()).hexdigest()}"'
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[str]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        # If-None-Match важнее If-Modified-Since (RFC 7232, 6)
+        tags = [t.strip() for t in if_none_match.split(",")]
+        return "*" in tags or etag in tags or etag.removeprefix("W/") in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def conditional_response(
+    request: Request, response: Response, user, *resolved, valid_from: Optional[datetime] = None,
+) -> Optional[Response]:
+    """
+    Проставляет ETag / Last-Modified / Cache-Control в `response`.
+    Если клиент уже имеет актуальную версию – возвращает готовый ответ 304,
+    иначе None (endpoint продолжает обычную обработку).
+    Endpoint с умолчаниями от текущей даты передаёт их уже вычисленными в `resolved`
+    и момент, с которого они действуют, в `valid_from` (Last-Modified не раньше него).
+    """
+    etag = make_etag(request, user, *resolved)
+    modified_at = max(filter(None, (user.data_updated_at, valid_from)), default=None)
+    last_modified = None
+    if modified_at:
+        last_modified = format_datetime(modified_at.replace(tzinfo=timezone.utc), usegmt=True)
+
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Authorization"}
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return None
+
+
+class StreamingAwareGZipMiddleware(GZipMiddleware):
+    """
+    GZip, не трогающий Server-Sent Events: GZipResponder не сбрасывает
+    буфер между кусками потока, и события застревали бы в нём.
+    EventSource всегда шлёт Accept: text/event-stream.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http" and "text/event-stream" in Headers(scope=scope).get("accept", ""):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
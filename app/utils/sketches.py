@@ -0,0 +1,168 @@
+# app/utils/sketches.py
+"""
+Сливаемые (mergeable) скетчи для статистики распределений:
+
+* TDigest      – приближённые квантили сумм (p50/p90/p99), точнее всего на хвостах;
+* HyperLogLog  – приближённое число различных значений (контрагентов), ~1.6% ошибки;
+* Histogram    – точная гистограмма по фиксированным корзинам 1-2-5.
+
+Все три сливаются: скетч за диапазон месяцев – слияние помесячных скетчей,
+без сортировки сырых сумм.
+"""
+import hashlib
+import math
+from bisect import bisect_right
+from typing import Iterable, List, Optional, Tuple
+
+
+class TDigest:
+    """Merging t-digest (Dunning) с функцией масштаба k1"""
+
+    def __init__(self, compression: float = 200, centroids: Iterable[Tuple[float, float]] = (),
+                 min_value: Optional[float] = None, max_value: Optional[float] = None):
+        self.compression = compression
+        self.centroids: List[Tuple[float, float]] = list(centroids)
+        self.min = min_value
+        self.max = max_value
+        self._buffer: List[Tuple[float, float]] = []
+
+    @property
+    def count(self) -> float:
+        self._flush()
+        return sum(w for _, w in self.centroids)
+
+    def add(self, value: float, weight: float = 1) -> None:
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self._buffer.append((value, weight))
+        if len(self._buffer) > 5 * self.compression:
+            self._flush()
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        other._flush()
+        if other.centroids:
+            self._buffer.extend(other.centroids)
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+            self._flush()
+        return self
+
+    def _k(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _k_inv(self, k: float) -> float:
+        return (math.sin(min(k * 2 * math.pi / self.compression, math.pi / 2)) + 1) / 2
+
+    def _flush(self) -> None:
+        if not self._buffer:
+            return
+        items = sorted(self.centroids + self._buffer)
+        self._buffer = []
+        total = sum(w for _, w in items)
+
+        merged = []
+        mean, weight = items[0]
+        so_far = 0.0
+        limit = self._k_inv(self._k(0) + 1) * total
+        for m, w in items[1:]:
+            if so_far + weight + w <= limit:
+                weight += w
+                mean += (m - mean) * w / weight
+            else:
+                merged.append((mean, weight))
+                so_far += weight
+                limit = self._k_inv(self._k(so_far / total) + 1) * total
+                mean, weight = m, w
+        merged.append((mean, weight))
+        self.centroids = merged
+
+    def quantile(self, q: float) -> Optional[float]:
+        self._flush()
+        if not self.centroids:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+
+        total = sum(w for _, w in self.centroids)
+        target = q * total
+        cumulative = 0.0
+        prev_mean, prev_mid = self.min, 0.0
+        for mean, weight in self.centroids:
+            mid = cumulative + weight / 2
+            if target < mid:
+                if mid == prev_mid:
+                    return mean
+                return prev_mean + (mean - prev_mean) * (target - prev_mid) / (mid - prev_mid)
+            prev_mean, prev_mid = mean, mid
+            cumulative += weight
+        if total == prev_mid:
+            return self.max
+        return prev_mean + (self.max - prev_mean) * (target - prev_mid) / (total - prev_mid)
+
+    def to_dict(self) -> dict:
+        self._flush()
+        return {"c": [[round(m, 6), w] for m, w in self.centroids], "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict], compression: float = 200) -> "TDigest":
+        data = data or {}
+        return cls(compression, [tuple(c) for c in data.get("c", [])], data.get("min"), data.get("max"))
+
+
+class HyperLogLog:
+    """HyperLogLog с 2^p регистрами по байту (p=12 -> 4 КБ, ошибка ~1.6%)"""
+
+    def __init__(self, p: int = 12, registers: Optional[bytes] = None):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(registers) if registers else bytearray(self.m)
+
+    def add(self, value: str) -> None:
+        h = int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), "big")
+        index = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+        return self
+
+    def count(self) -> int:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            # малые множества – линейный подсчёт по пустым регистрам
+            estimate = self.m * math.log(self.m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.registers)
+
+
+class Histogram:
+    """Гистограмма по фиксированным границам 1-2-5 (0, 1, 2, 5, 10, ... 1 000 000)"""
+
+    EDGES = [0.0] + [m * 10 ** e for e in range(0, 6) for m in (1, 2, 5)] + [1e6]
+
+    def __init__(self, counts: Optional[List[int]] = None):
+        self.counts = list(counts) if counts else [0] * len(self.EDGES)
+
+    def add(self, value: float) -> None:
+        self.counts[max(bisect_right(self.EDGES, value) - 1, 0)] += 1
+
+    def merge(self, other: "Histogram") -> "Histogram":
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        return self
+
+    def buckets(self) -> List[dict]:
+        """[{lower, upper, count}] без пустых корзин; у последней upper = None"""
+        edges = self.EDGES + [None]
+        return [
+            {"lower": edges[i], "upper": edges[i + 1], "count": c}
+            for i, c in enumerate(self.counts) if c
+        ]
@@ -0,0 +1,74 @@
+# app/utils/static.py
+import gzip
+import mimetypes
+import os
+import shutil
+import sys
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+# Какие файлы имеет смысл сжимать заранее (шрифты/картинки уже сжаты)
+COMPRESSIBLE = (".html", ".css", ".js", ".json", ".svg", ".txt", ".ttf")
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles, который отдаёт заранее сжатый `<file>.gz`, если он лежит рядом
+    с исходным файлом и клиент поддерживает gzip. Сжатие не тратит CPU на каждый запрос.
+    Все ответы помечаются `Cache-Control: no-cache`, чтобы браузер перепроверял
+    их по ETag / Last-Modified и получал 304 без тела.
+    """
+
+    def file_response(self, full_path, stat_result, scope: Scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        gz_path = f"{full_path}.gz"
+
+        if "gzip" in request_headers.get("accept-encoding", "") and os.path.isfile(gz_path):
+            media_type = mimetypes.guess_type(str(full_path))[0] or "text/plain"
+            response = FileResponse(
+                gz_path,
+                status_code=status_code,
+                stat_result=os.stat(gz_path),
+                method=scope["method"],
+                media_type=media_type,
+                headers={"Content-Encoding": "gzip"},
+            )
+        else:
+            response = FileResponse(
+                full_path, status_code=status_code, stat_result=stat_result, method=scope["method"]
+            )
+
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["Vary"] = "Accept-Encoding"
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+def precompress(directory: str) -> int:
+    """
+    Создаёт `<file>.gz` для всех сжимаемых файлов каталога (рекурсивно),
+    если .gz отсутствует или старше исходника. Возвращает число сжатых файлов.
+    """
+    count = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not name.endswith(COMPRESSIBLE):
+                continue
+            src = os.path.join(root, name)
+            dst = f"{src}.gz"
+            if os.path.exists(dst) and os.path.getmtime(dst) >= os.path.getmtime(src):
+                continue
+            with open(src, "rb") as f_in, gzip.open(dst, "wb", compresslevel=9) as f_out:
+                shutil.copyfileobj(f_in, f_out)
+            count += 1
+    return count
+
+
+if __name__ == "__main__":
+    # python -m app.utils.static frontend
+    target = sys.argv[1] if len(sys.argv) > 1 else "frontend"
+    print(f"Сжато файлов: {precompress(target)}")